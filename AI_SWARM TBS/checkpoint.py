@@ -0,0 +1,308 @@
+# checkpoint.py
+# Versioned binary save files for a match in progress: the engine state (see
+# GameEngine.get_state) plus the connector's journal and ancestral memory.
+# Numbers are written column by column with struct/array, strings as one
+# length table plus one UTF-8 blob, so saving and loading take milliseconds
+# and never unpickle code. Usage:
+#   python main.py --resume checkpoint.swarm
+#
+# Layout (little endian):
+#   header   8s magic | H version
+#   engine   i turn | q next_hive_id | q next_queen_id | i max_hives | i width | i height | Q seed
+#            rng: B version | 625 x I internal state | B has_gauss | d gauss
+#            I hive count, then one array per column (see HIVE_COLUMNS), queens
+#            I queue length | q queen ids
+#   events   strings texts | b kinds | i turns | q hive ids | b factions (-1 = none)
+#            diaries: I refs per hive | q refs | q lines written per hive
+#   connector B present | strings memory | B post_mortem_done | journal entries | journal summaries | I summarized_upto
+import array
+import queue
+import struct
+import sys
+import threading
+import time
+import constants
+from events import EVENT_KINDS
+from file_writer import atomic_write
+
+MAGIC = b"SWRMCKPT"
+CHECKPOINT_VERSION = 2 # 2: the whole EventLog, diaries as refs into it
+
+FACTIONS = [constants.FACTION_PLAYER, constants.FACTION_ENEMY]
+OBJECTIVES = [constants.OBJ_BALANCED, constants.OBJ_AGGRESSIVE, constants.OBJ_ECONOMY]
+
+# (index into a get_state() hive tuple, array typecode)
+HIVE_COLUMNS = [
+    (0, "q"), # hive_id
+    (1, "d"), # x
+    (2, "d"), # y
+    (4, "q"), # food
+    (5, "q"), # workers
+    (6, "q"), # warriors
+    (7, "d"), # gathering_modifier
+    (8, "q"), # attack_multiplier
+    (9, "q"), # defense_multiplier
+]
+
+_HEADER = struct.Struct("<8sH")
+_ENGINE = struct.Struct("<iqqiiiQ")
+_COUNT = struct.Struct("<I")
+_FLAG = struct.Struct("<B")
+_FLOAT = struct.Struct("<d")
+
+class CheckpointError(Exception):
+    pass
+
+# ==========================================
+# ENCODING
+# ==========================================
+
+class _Writer:
+    def __init__(self):
+        self.parts = []
+
+    def pack(self, fmt, *values):
+        self.parts.append(fmt.pack(*values))
+
+    def array(self, typecode, values):
+        data = array.array(typecode, values)
+        if sys.byteorder != "little": data.byteswap()
+        self.pack(_COUNT, len(data))
+        self.parts.append(data.tobytes())
+
+    def strings(self, values):
+        encoded = [value.encode("utf-8") for value in values]
+        self.array("I", [len(value) for value in encoded])
+        self.parts.append(b"".join(encoded))
+
+    def getvalue(self):
+        return b"".join(self.parts)
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.offset = 0
+
+    def unpack(self, fmt):
+        if self.offset + fmt.size > len(self.data):
+            raise CheckpointError("Checkpoint is truncated.")
+        values = fmt.unpack_from(self.data, self.offset)
+        self.offset += fmt.size
+        return values
+
+    def array(self, typecode):
+        (count,) = self.unpack(_COUNT)
+        data = array.array(typecode)
+        end = self.offset + count * data.itemsize
+        if end > len(self.data):
+            raise CheckpointError("Checkpoint is truncated.")
+        data.frombytes(self.data[self.offset:end])
+        if sys.byteorder != "little": data.byteswap()
+        self.offset = end
+        return data
+
+    def strings(self):
+        lengths = self.array("I")
+        values = []
+        for length in lengths:
+            end = self.offset + length
+            if end > len(self.data):
+                raise CheckpointError("Checkpoint is truncated.")
+            values.append(bytes(self.data[self.offset:end]).decode("utf-8"))
+            self.offset = end
+        return values
+
+
+def encode(engine_state, connector_state=None):
+    out = _Writer()
+    out.pack(_HEADER, MAGIC, CHECKPOINT_VERSION)
+
+    width, height = engine_state["map_size"]
+    out.pack(_ENGINE, engine_state["turn_number"], engine_state["next_hive_id"], engine_state["next_queen_id"],
+             engine_state["max_hives"], width, height, engine_state["seed"])
+    version, internal, gauss = engine_state["rng"]
+    out.pack(_FLAG, version)
+    out.array("I", internal)
+    out.pack(_FLAG, gauss is not None)
+    out.pack(_FLOAT, gauss or 0.0)
+
+    hives = engine_state["hives"]
+    out.pack(_COUNT, len(hives))
+    for index, typecode in HIVE_COLUMNS:
+        out.array(typecode, [hive[index] for hive in hives])
+    out.array("b", [FACTIONS.index(hive[3]) for hive in hives])
+    out.array("I", [len(hive[10]) for hive in hives])
+    out.array("q", [queen_id for hive in hives for queen_id, _ in hive[10]])
+    out.array("b", [OBJECTIVES.index(objective) for hive in hives for _, objective in hive[10]])
+    out.array("q", engine_state["queue"])
+
+    events = engine_state["events"]
+    out.strings(events["texts"])
+    out.array("b", events["kinds"])
+    out.array("i", events["turns"])
+    out.array("q", events["hive_ids"])
+    out.array("b", [-1 if faction is None else FACTIONS.index(faction) for faction in events["factions"]])
+    diaries = engine_state["diaries"]
+    out.array("I", [len(refs) for refs, _ in diaries])
+    out.array("q", [ref for refs, _ in diaries for ref in refs])
+    out.array("q", [written for _, written in diaries])
+
+    out.pack(_FLAG, connector_state is not None)
+    if connector_state is not None:
+        out.strings([connector_state["ancestral_memory"]])
+        out.pack(_FLAG, connector_state["post_mortem_done"])
+        journal = connector_state["journal"]
+        out.strings(journal["entries"])
+        out.strings(journal["summaries"])
+        out.pack(_COUNT, journal["summarized_upto"])
+    return out.getvalue()
+
+
+def decode(data):
+    """Returns (engine_state, connector_state or None)."""
+    reader = _Reader(data)
+    magic, version = reader.unpack(_HEADER)
+    if magic != MAGIC:
+        raise CheckpointError("Not an AI SWARM checkpoint.")
+    if version != CHECKPOINT_VERSION:
+        raise CheckpointError(f"Unsupported checkpoint version {version} (expected {CHECKPOINT_VERSION}).")
+
+    turn_number, next_hive_id, next_queen_id, max_hives, width, height, seed = reader.unpack(_ENGINE)
+    (rng_version,) = reader.unpack(_FLAG)
+    internal = tuple(reader.array("I"))
+    (has_gauss,) = reader.unpack(_FLAG)
+    (gauss,) = reader.unpack(_FLOAT)
+
+    (count,) = reader.unpack(_COUNT)
+    columns = [reader.array(typecode).tolist() for _, typecode in HIVE_COLUMNS]
+    factions = reader.array("b")
+    queen_counts = reader.array("I")
+    queen_ids = reader.array("q")
+    objectives = reader.array("b")
+    queue_ids = reader.array("q").tolist()
+
+    events = {
+        "texts": reader.strings(),
+        "kinds": reader.array("b").tolist(),
+        "turns": reader.array("i").tolist(),
+        "hive_ids": reader.array("q").tolist(),
+        "factions": [None if code < 0 else FACTIONS[code] for code in reader.array("b")],
+    }
+    if not (len(events["texts"]) == len(events["kinds"]) == len(events["turns"]) == len(events["hive_ids"]) == len(events["factions"])):
+        raise CheckpointError("Checkpoint event columns differ in length.")
+    if any(not 0 <= kind < len(EVENT_KINDS) for kind in events["kinds"]):
+        raise CheckpointError("Checkpoint has an unknown event kind.")
+    diary_counts = reader.array("I")
+    diary_refs = reader.array("q").tolist()
+    diary_written = reader.array("q")
+    if any(not 0 <= ref < len(events["texts"]) for ref in diary_refs):
+        raise CheckpointError("Checkpoint diary points outside the event log.")
+
+    hives = []
+    diaries = []
+    queen_cursor = diary_cursor = 0
+    for row in range(count):
+        hive_id, x, y, food, workers, warriors, modifier, attack, defense = (column[row] for column in columns)
+        queens = [(queen_ids[i], OBJECTIVES[objectives[i]]) for i in range(queen_cursor, queen_cursor + queen_counts[row])]
+        queen_cursor += queen_counts[row]
+        refs = diary_refs[diary_cursor:diary_cursor + diary_counts[row]]
+        diary_cursor += diary_counts[row]
+        diaries.append((refs, diary_written[row]))
+        hives.append((hive_id, x, y, FACTIONS[factions[row]], food, workers, warriors, modifier, attack, defense, queens,
+                      [events["texts"][ref] for ref in refs]))
+
+    engine_state = {
+        "turn_number": turn_number,
+        "next_hive_id": next_hive_id,
+        "next_queen_id": next_queen_id,
+        "max_hives": max_hives,
+        "map_size": (width, height),
+        "seed": seed,
+        "rng": (rng_version, internal, gauss if has_gauss else None),
+        "hives": hives,
+        "queue": queue_ids,
+        "events": events,
+        "diaries": diaries,
+    }
+
+    connector_state = None
+    (has_connector,) = reader.unpack(_FLAG)
+    if has_connector:
+        (memory,) = reader.strings()
+        (post_mortem_done,) = reader.unpack(_FLAG)
+        entries = reader.strings()
+        summaries = reader.strings()
+        (summarized_upto,) = reader.unpack(_COUNT)
+        connector_state = {
+            "ancestral_memory": memory,
+            "post_mortem_done": bool(post_mortem_done),
+            "journal": {"entries": entries, "summaries": summaries, "summarized_upto": summarized_upto},
+        }
+    return engine_state, connector_state
+
+# ==========================================
+# SAVE / LOAD
+# ==========================================
+
+def save_checkpoint(path, engine, connector=None):
+    data = encode(engine.get_state(), connector.get_state() if connector else None)
+    atomic_write(path, data)
+    return len(data)
+
+
+def load_checkpoint(path, engine, connector=None):
+    """Restores engine (and connector, if given) in place from path."""
+    with open(path, "rb") as f:
+        engine_state, connector_state = decode(f.read())
+    engine.set_state(engine_state)
+    if connector and connector_state:
+        connector.set_state(connector_state)
+    return engine
+
+
+class Autosaver:
+    """Saves every `every` turns. The state is captured on the calling thread
+    (plain lists, cheap), then encoded and written on a background thread.
+    If saves arrive faster than the disk keeps up, only the newest waiting one is kept."""
+    def __init__(self, path=constants.CHECKPOINT_FILE, every=constants.CHECKPOINT_EVERY_TURNS):
+        self.path = path
+        self.every = every
+        self.saves = 0
+        self.superseded = 0
+        self._pending = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def turn_ended(self, engine, connector=None):
+        if not self.every or (engine.turn_number - 1) % self.every: return
+        item = (engine.get_state(), connector.get_state() if connector else None)
+        try:
+            self._pending.get_nowait() # Still waiting behind a slow write: the newer state wins
+            self.superseded += 1
+        except queue.Empty:
+            pass
+        self._pending.put_nowait(item) # Single producer, so the slot is free here
+
+    def _run(self):
+        while True:
+            item = self._pending.get()
+            if item is None: return
+            try:
+                atomic_write(self.path, encode(*item))
+                self.saves += 1
+            except Exception as e: # A bad state must not kill the thread and leave close() waiting on it
+                print(f"Autosave Error ({self.path}): {str(e)}")
+
+    def close(self, timeout=constants.CHECKPOINT_CLOSE_TIMEOUT):
+        # The last waiting save still gets written, but shutdown never waits longer than `timeout`
+        if not self._thread.is_alive(): return
+        deadline = time.monotonic() + timeout
+        try:
+            self._pending.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(max(0.0, deadline - time.monotonic()))
+
+    def summary(self):
+        return f"Autosave: {self.saves} checkpoints written to {self.path} | {self.superseded} superseded while busy"
@@ -12,6 +12,12 @@ MAP_HEIGHT = 720
 TERMINAL_WIDTH = SCREEN_WIDTH - MAP_WIDTH
 TERMINAL_HEIGHT = 720
 INPUT_BOX_HEIGHT = 200
+UI_TEXT_CACHE_SIZE = 512 # Rendered text surfaces kept by UIManager (LRU)
+UI_DIRTY_RECTS = True # Redraw and push only the screen regions that changed; idle frames cost nothing
+SIM_IDLE_SECONDS = 0.005 # Simulation thread sleep when it has nothing to do (waiting on Ollama/the user)
+SIM_MIN_TURN_SECONDS = 0.1 # Shortest time between turns, so fully gated turns stay watchable
+TURBO_RENDER_EVERY_TURNS = 25 # Turbo mode: publish a frame every N turns...
+TURBO_RENDER_INTERVAL_MS = 250 # ...or every M milliseconds, whichever comes first
 
 COLOR_BG_MAP = (30, 30, 30)
 COLOR_BG_TERMINAL = (15, 15, 15)
@@ -42,12 +48,66 @@ COST_QUEEN = 50
 FACTION_PLAYER = "BLUE"
 FACTION_ENEMY = "RED"
 MAX_HIVES = 20 # Hard cap for performance
+DIARY_LENGTH = 5 # Newest diary lines kept per hive (the prompt and the UI only read the last 5)
 
 # ==========================================
 # AI / PARSER CONSTANTS
 # ==========================================
 TARGET_QUEEN = "QUEEN"
 
+# Tiered models: a small fast model confirms routine objectives, the large one handles critical turns
+LLM_MODEL_LARGE = "llama3"
+LLM_MODEL_FAST = "llama3.2"
+ROUTER_ENABLED = True
+ROUTER_SURGE_RATIO = 1.5 # Enemy warriors grew by this factor since last turn...
+ROUTER_SURGE_MINIMUM = 10 # ...and by at least this many warriors
+LLM_BATCH_DECISIONS = True # Ask for every waiting Queen in one request per turn
+LLM_MAX_IN_FLIGHT = 4 # Concurrent Ollama requests
+LLM_HOUSEKEEPING_WORKERS = 1 # Journal summaries and the post-mortem, kept off the decision workers
+LLM_SHUTDOWN_GRACE = 10 # Seconds close() waits for a running summary/post-mortem before abandoning it
+LLM_CONNECT_TIMEOUT = 5 # Seconds
+LLM_READ_TIMEOUT = 300 # Seconds. Slow local models can take minutes per generation
+LLM_STREAM = True # Apply the objective as soon as the ACTION line has streamed in
+LLM_MAX_REMARK_TOKENS = 200 # Cut the REMARKS diary off after this many tokens (None = no cap)
+LLM_KEEP_ALIVE = "30m" # Keep the model and its prompt cache loaded between requests
+LLM_STRUCTURED_OUTPUT = True # Ask Ollama for schema-constrained JSON instead of free-form lines
+LLM_MAX_CORRECTIONS = 2 # Short "fix your format" follow-ups before a decision counts as a strike
+LLM_PREFETCH_DEPTH = 3 # Queued queens whose individual requests may be in flight at once
+
+JOURNAL_TOKEN_BUDGET = 1500 # Approximate tokens of journal context injected into each prompt
+JOURNAL_RECENT_ENTRIES = 10 # Newest entries kept verbatim
+JOURNAL_SUMMARY_CHUNK = 10 # Older entries are summarized in groups of this size
+JOURNAL_MAX_SUMMARIES = 8 # Beyond this, the oldest summaries are rolled up together
+JOURNAL_JSONL = True # Also write journal.jsonl (one compact JSON record per entry) for streaming/indexing
+
+# --- NEW: Background file writer (journal + memory) ---
+WRITER_FLUSH_INTERVAL = 2.0 # Seconds between batched flushes
+WRITER_QUEUE_SIZE = 1000 # Queued writes before producers block
+
+# Decision gate: skip the LLM when a queen's quantized situation is unchanged
+GATE_ENABLED = True
+GATE_FOOD_BAND = 50
+GATE_UNIT_BAND = 5 # Workers / warriors
+GATE_THREAT_BAND = 10 # Total enemy warriors
+GATE_MAX_SKIP_TURNS = 10 # Always re-ask a queen after this many turns
+
+# Decision cache: parsed decisions memoized on a hash of the decision-relevant state
+DECISION_CACHE_ENABLED = True # Turn off when you want fresh sampling every time
+DECISION_CACHE_FILE = "decision_cache.jsonl"
+DECISION_CACHE_MAX_ENTRIES = 5000
+DECISION_CACHE_TTL = 7 * 24 * 3600 # Seconds
+
+# Replays: seed + per-turn objective decisions, replayable without the model (python replay.py replay.jsonl)
+REPLAY_ENABLED = True
+REPLAY_FILE = "replay.jsonl"
+REPLAY_SNAPSHOT_INTERVAL = 50 # Full state snapshot every N turns so a replay can seek without re-simulating
+
+# Binary checkpoints of the match in progress (python main.py --resume checkpoint.swarm)
+CHECKPOINT_ENABLED = True
+CHECKPOINT_FILE = "checkpoint.swarm"
+CHECKPOINT_EVERY_TURNS = 10 # Autosave interval, written from a background thread
+CHECKPOINT_CLOSE_TIMEOUT = 10 # Seconds shutdown waits for the last autosave to finish
+
 # Macro Objectives (LLM Uses These)
 OBJ_BALANCED = "Balanced"
 OBJ_AGGRESSIVE = "Aggressive"
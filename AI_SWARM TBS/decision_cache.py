@@ -0,0 +1,109 @@
+# decision_cache.py
+# Memoizes parsed LLM decisions keyed on a canonical hash of everything the
+# decision depends on. Lives in memory as an LRU and is mirrored to a JSONL
+# file so replayed matches can reuse decisions from earlier sessions.
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+import constants
+from file_writer import atomic_write
+
+class DecisionCache:
+    def __init__(self, path=constants.DECISION_CACHE_FILE, max_entries=constants.DECISION_CACHE_MAX_ENTRIES,
+                 ttl_seconds=constants.DECISION_CACHE_TTL, enabled=constants.DECISION_CACHE_ENABLED, writer=None):
+        self.path = path
+        self.writer = writer # Optional file_writer.AsyncFileWriter; otherwise the file is written in place
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds # None = never expire
+        self.enabled = enabled
+        self.entries = OrderedDict() # key -> (stored_at, parsed_data)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if enabled and path:
+            self._load()
+
+    @staticmethod
+    def make_key(model_name, queen, engine, user_instructions, memory_text):
+        enemy_stats = engine.map.faction_stats(constants.FACTION_ENEMY)
+        state = {
+            "model": model_name,
+            "food": queen.hive.food,
+            "workers": queen.hive.workers,
+            "warriors": queen.hive.warriors,
+            "objective": queen.objective,
+            "player_hives": engine.map.hive_count(constants.FACTION_PLAYER),
+            "enemy_hives": enemy_stats.hives,
+            "enemy_warriors": enemy_stats.warriors,
+            "advisor": user_instructions.strip(),
+            "memory": hashlib.sha256(memory_text.encode()).hexdigest()[:16],
+        }
+        canonical = json.dumps(state, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _expired(self, stored_at):
+        return self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds
+
+    def _load(self):
+        if not os.path.exists(self.path): return
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue # Torn write from a crash; skip it
+                if not self._expired(record["t"]):
+                    self.entries[record["k"]] = (record["t"], record["d"])
+                    self.entries.move_to_end(record["k"])
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def get(self, key):
+        if not self.enabled: return None
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or self._expired(entry[0]):
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, key, parsed_data):
+        if not self.enabled or key is None: return
+        stored_at = time.time()
+        with self._lock:
+            self.entries[key] = (stored_at, parsed_data)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        if self.path:
+            line = json.dumps({"k": key, "t": stored_at, "d": parsed_data}) + "\n"
+            if self.writer:
+                self.writer.append(self.path, line)
+            else:
+                with open(self.path, "a") as f:
+                    f.write(line)
+
+    def save(self):
+        # Rewrite the append log without evicted/expired entries
+        if not self.enabled or not self.path: return
+        with self._lock:
+            text = "".join(json.dumps({"k": key, "t": stored_at, "d": parsed_data}) + "\n"
+                           for key, (stored_at, parsed_data) in self.entries.items() if not self._expired(stored_at))
+        if self.writer:
+            self.writer.replace(self.path, text) # Queued behind the appends it supersedes
+        else:
+            atomic_write(self.path, text)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        return f"Decision cache: {self.hits} hits | {self.misses} misses ({self.hit_rate:.0%}) | {len(self.entries)} entries"
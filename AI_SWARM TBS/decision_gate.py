@@ -0,0 +1,62 @@
+# decision_gate.py
+# Sits between GameEngine.start_turn and the LLM. Each queen's situation is
+# quantized into a fingerprint; if it matches the one from her last decision
+# (and no combat happened since) she keeps her current objective and the model
+# call is skipped.
+import constants
+
+class DecisionGate:
+    def __init__(self, food_band=constants.GATE_FOOD_BAND, unit_band=constants.GATE_UNIT_BAND,
+                 threat_band=constants.GATE_THREAT_BAND, max_skip_turns=constants.GATE_MAX_SKIP_TURNS):
+        self.food_band = food_band
+        self.unit_band = unit_band
+        self.threat_band = threat_band
+        self.max_skip_turns = max_skip_turns # Force a fresh decision at least this often
+
+        self.decisions = {} # queen_id -> (fingerprint, turn, diary lines written at decision time)
+        self.skips = 0
+        self.queries = 0
+
+    def fingerprint(self, queen, engine, user_instructions=""):
+        hive = queen.hive
+        enemy_stats = engine.map.faction_stats(constants.FACTION_ENEMY)
+        return (
+            queen.objective,
+            hive.food // self.food_band,
+            hive.workers // self.unit_band,
+            hive.warriors // self.unit_band,
+            engine.map.hive_count(constants.FACTION_PLAYER), # A lost (or new) hive changes the picture
+            enemy_stats.hives,
+            enemy_stats.warriors // self.threat_band,
+            user_instructions,
+        )
+
+    def _combat_since(self, queen, diary_written):
+        entries, lost = queen.hive.diaries.since(diary_written)
+        # Lines that already fell off the ring buffer might have been combat; assume they were
+        return lost or any("COMBAT" in entry for entry in entries)
+
+    def should_query(self, queen, engine, user_instructions=""):
+        previous = self.decisions.get(queen.queen_id)
+        if previous is not None:
+            fingerprint, turn, diary_written = previous
+            unchanged = fingerprint == self.fingerprint(queen, engine, user_instructions)
+            fresh = engine.turn_number - turn < self.max_skip_turns
+            if unchanged and fresh and not self._combat_since(queen, diary_written):
+                self.skips += 1
+                return False
+        self.queries += 1
+        return True
+
+    def record(self, queen, engine, user_instructions=""):
+        # Call after the decision has been applied, so the new objective is part of the fingerprint
+        self.decisions[queen.queen_id] = (self.fingerprint(queen, engine, user_instructions), engine.turn_number, queen.hive.diaries.written)
+
+    @property
+    def skip_rate(self):
+        total = self.skips + self.queries
+        return self.skips / total if total else 0.0
+
+    def summary(self):
+        # Queries go to whatever answers decisions: the model, or a scripted/random source
+        return f"Decision gate: {self.queries} decisions asked for | {self.skips} skipped ({self.skip_rate:.0%})"
@@ -2,16 +2,36 @@
 import constants
 import random
 import math
+from events import EventLog, Diary, restore_diary, EVENT_OBJECTIVE, EVENT_COMBAT, EVENT_SPAWN, EVENT_DESTROYED
+
+HIVE_SPACING = 120 # Minimum distance between hives
 
 class Queen:
+    __slots__ = ("hive", "queen_id", "objective", "action_queued")
+
     def __init__(self, hive, queen_id):
         self.hive = hive
         self.queen_id = queen_id
         self.objective = constants.OBJ_BALANCED # Default state
         self.action_queued = None
 
+class FactionStats:
+    # Running totals for one faction's live hives, kept current by Hive setters
+    __slots__ = ("hives", "food", "workers", "warriors")
+
+    def __init__(self):
+        self.hives = 0
+        self.food = 0
+        self.workers = 0
+        self.warriors = 0
+
 class Hive:
-    def __init__(self, hive_id, x, y, faction):
+    # --- NEW: Slotted, so thousands of hives don't each carry a __dict__ ---
+    __slots__ = ("_stats", "hive_id", "x", "y", "faction", "_food", "_workers", "_warriors", "queens",
+                 "gathering_modifier", "diaries", "is_destroyed", "attack_multiplier", "defense_multiplier")
+
+    def __init__(self, hive_id, x, y, faction, event_log=None):
+        self._stats = None # Set by Map.add_hive
         self.hive_id = hive_id
         self.x = x
         self.y = y
@@ -21,7 +41,8 @@ class Hive:
         self.warriors = constants.STARTING_WARRIORS
         self.queens = []
         self.gathering_modifier = 1.0
-        self.diaries = [] 
+        # Newest DIARY_LENGTH lines; the text itself lives once in the engine's EventLog
+        self.diaries = Diary(event_log if event_log is not None else EventLog())
         self.is_destroyed = False
         
         # --- NEW: Combat Multipliers ---
@@ -29,33 +50,224 @@ class Hive:
         self.attack_multiplier = 1 
         self.defense_multiplier = 2 # Defender's Advantage (+1)
 
+    # --- NEW: Counted stats push their deltas into the faction totals ---
+    @property
+    def food(self):
+        return self._food
+
+    @food.setter
+    def food(self, value):
+        if self._stats: self._stats.food += value - self._food
+        self._food = value
+
+    @property
+    def workers(self):
+        return self._workers
+
+    @workers.setter
+    def workers(self, value):
+        if self._stats: self._stats.workers += value - self._workers
+        self._workers = value
+
+    @property
+    def warriors(self):
+        return self._warriors
+
+    @warriors.setter
+    def warriors(self, value):
+        if self._stats: self._stats.warriors += value - self._warriors
+        self._warriors = value
+
+    def _attach_stats(self, stats):
+        stats.hives += 1
+        stats.food += self._food
+        stats.workers += self._workers
+        stats.warriors += self._warriors
+        self._stats = stats
+
+    def _detach_stats(self):
+        stats = self._stats
+        if not stats: return
+        stats.hives -= 1
+        stats.food -= self._food
+        stats.workers -= self._workers
+        stats.warriors -= self._warriors
+        self._stats = None
+
+class SpatialGrid:
+    """Uniform grid over the map. Buckets (key, x, y) entries by cell so radius and
+    nearest-neighbour lookups only touch the cells around the query point."""
+    def __init__(self, cell_size=HIVE_SPACING):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.size = 0
+        self.bounds = None # (min_gx, min_gy, max_gx, max_gy) of every cell used since the grid was last empty
+
+    def _cell(self, x, y):
+        return int(x // self.cell_size), int(y // self.cell_size)
+
+    def insert(self, key, x, y):
+        cell = self._cell(x, y)
+        self.cells.setdefault(cell, []).append((key, x, y))
+        self.size += 1
+        gx, gy = cell
+        if self.bounds is None:
+            self.bounds = (gx, gy, gx, gy)
+        else:
+            min_gx, min_gy, max_gx, max_gy = self.bounds
+            self.bounds = (min(min_gx, gx), min(min_gy, gy), max(max_gx, gx), max(max_gy, gy))
+
+    def remove(self, key, x, y):
+        cell = self._cell(x, y)
+        bucket = self.cells.get(cell, [])
+        for i, entry in enumerate(bucket):
+            if entry[0] == key:
+                bucket.pop(i)
+                self.size -= 1
+                if not bucket:
+                    del self.cells[cell]
+                # Bounds only grow (a superset still bounds the search) until the grid empties
+                if not self.size:
+                    self.bounds = None
+                return
+
+    def any_within(self, x, y, radius):
+        reach = math.ceil(radius / self.cell_size)
+        cx, cy = self._cell(x, y)
+        for gx in range(cx - reach, cx + reach + 1):
+            for gy in range(cy - reach, cy + reach + 1):
+                for _, ex, ey in self.cells.get((gx, gy), ()):
+                    if math.hypot(x - ex, y - ey) < radius:
+                        return True
+        return False
+
+    def nearest(self, x, y, predicate=None):
+        """Returns (key, distance) of the closest entry accepted by predicate, or (None, None)."""
+        if not self.size: return None, None
+        cx, cy = self._cell(x, y)
+        min_gx, min_gy, max_gx, max_gy = self.bounds
+        max_ring = max(cx - min_gx, max_gx - cx, cy - min_gy, max_gy - cy, 0)
+        best_key, best_dist = None, None
+
+        for ring in range(max_ring + 1):
+            # Anything in this ring is at least (ring - 1) cells away
+            if best_dist is not None and (ring - 1) * self.cell_size > best_dist:
+                break
+            for cell in self._ring_cells(cx, cy, ring):
+                for key, ex, ey in self.cells.get(cell, ()):
+                    if predicate and not predicate(key): continue
+                    dist = math.hypot(x - ex, y - ey)
+                    if best_dist is None or dist < best_dist:
+                        best_key, best_dist = key, dist
+        return best_key, best_dist
+
+    @staticmethod
+    def _ring_cells(cx, cy, ring):
+        # Only the square's border: the top and bottom rows, then the sides between them
+        if ring == 0:
+            yield cx, cy
+            return
+        for gx in range(cx - ring, cx + ring + 1):
+            yield gx, cy - ring
+            yield gx, cy + ring
+        for gy in range(cy - ring + 1, cy + ring):
+            yield cx - ring, gy
+            yield cx + ring, gy
+
 class Map:
-    def __init__(self):
+    def __init__(self, width=constants.MAP_WIDTH, height=constants.MAP_HEIGHT):
+        self.width = width
+        self.height = height
         self.hives = []
+        self.hive_index = SpatialGrid()
+
+        # --- NEW: Per-faction live hives (insertion ordered) and running totals ---
+        self.faction_hives = {}
+        self.stats = {}
+        self._live_cache = {}
+        self._pending_removal = False
+
+    def add_hive(self, hive):
+        self.hives.append(hive)
+        self.hive_index.insert(hive, hive.x, hive.y)
+        self.faction_hives.setdefault(hive.faction, {})[hive.hive_id] = hive
+        hive._attach_stats(self.faction_stats(hive.faction))
+        self._live_cache.pop(hive.faction, None)
+
+    def destroy_hive(self, hive):
+        # The hive stays in self.hives (and the spatial index) until the end of the turn
+        hive.is_destroyed = True
+        hive._detach_stats()
+        del self.faction_hives[hive.faction][hive.hive_id]
+        self._live_cache.pop(hive.faction, None)
+        self._pending_removal = True
+
+    def remove_destroyed(self):
+        if not self._pending_removal: return
+        for hive in self.hives:
+            if hive.is_destroyed:
+                self.hive_index.remove(hive, hive.x, hive.y)
+        self.hives = [h for h in self.hives if not h.is_destroyed]
+        self._pending_removal = False
+
+    def faction_stats(self, faction):
+        if faction not in self.stats:
+            self.stats[faction] = FactionStats()
+        return self.stats[faction]
+
+    def hive_count(self, faction):
+        stats = self.stats.get(faction)
+        return stats.hives if stats else 0
+
+    def live_hives(self, faction):
+        # Cached list view, rebuilt only after a hive of this faction spawns or dies
+        if faction not in self._live_cache:
+            self._live_cache[faction] = list(self.faction_hives.get(faction, {}).values())
+        return self._live_cache[faction]
+
+    def enemy_hives(self, faction):
+        enemy_factions = [f for f in self.faction_hives if f != faction]
+        if len(enemy_factions) == 1:
+            return self.live_hives(enemy_factions[0])
+        return [h for f in enemy_factions for h in self.live_hives(f)]
+
+    def is_crowded(self, x, y):
+        return self.hive_index.any_within(x, y, HIVE_SPACING)
+
+    def nearest_hive(self, x, y, predicate=None):
+        return self.hive_index.nearest(x, y, predicate)[0]
 
 class GameEngine:
-    def __init__(self):
-        self.map = Map()
+    def __init__(self, max_hives=constants.MAX_HIVES, map_width=constants.MAP_WIDTH, map_height=constants.MAP_HEIGHT, seed=None):
+        self.map = Map(map_width, map_height)
+        self.max_hives = max_hives
         self.turn_number = 1
         self.active_queens_queue = [] 
         self._next_hive_id = 1
         self._next_queen_id = 1
+        self.events = EventLog() # Every typed event of the match, append-only and indexed
+
+        # --- NEW: Per-engine RNG so a match can be replayed from its seed ---
+        # Without a seed one is drawn from the global RNG, so random.seed() still reproduces whole batches
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.recorder = None # Optional replay.ReplayRecorder
         self._create_initial_hives()
 
     def _create_initial_hives(self):
-        blue_hive = Hive(self._next_hive_id, constants.MAP_WIDTH // 4, constants.MAP_HEIGHT // 2, constants.FACTION_PLAYER)
+        blue_hive = Hive(self._next_hive_id, self.map.width // 4, self.map.height // 2, constants.FACTION_PLAYER, self.events)
         self._next_hive_id += 1
         blue_queen = Queen(blue_hive, self._next_queen_id)
         self._next_queen_id += 1
         blue_hive.queens.append(blue_queen)
-        self.map.hives.append(blue_hive)
+        self.map.add_hive(blue_hive)
 
-        red_hive = Hive(self._next_hive_id, (constants.MAP_WIDTH // 4) * 3, constants.MAP_HEIGHT // 2, constants.FACTION_ENEMY)
+        red_hive = Hive(self._next_hive_id, (self.map.width // 4) * 3, self.map.height // 2, constants.FACTION_ENEMY, self.events)
         self._next_hive_id += 1
         red_queen = Queen(red_hive, self._next_queen_id)
         self._next_queen_id += 1
         red_hive.queens.append(red_queen)
-        self.map.hives.append(red_hive)
+        self.map.add_hive(red_hive)
 
     def start_turn(self):
         self.active_queens_queue.clear()
@@ -72,20 +284,31 @@ class GameEngine:
                     self.active_queens_queue.append(queen)
 
     def process_queen_command(self, queen, parsed_data):
-        action_str = parsed_data['action']
+        self.set_queen_objective(queen, parsed_data['action'])
+        self.log_queen_remarks(queen, parsed_data['remarks'])
+
+    # --- NEW: Split so a streamed ACTION can apply before its REMARKS arrive ---
+    def set_queen_objective(self, queen, action_str):
         if constants.OBJ_AGGRESSIVE in action_str:
             queen.objective = constants.OBJ_AGGRESSIVE
         elif constants.OBJ_ECONOMY in action_str:
             queen.objective = constants.OBJ_ECONOMY
         else:
             queen.objective = constants.OBJ_BALANCED
+        if self.recorder: self.recorder.record_objective(self.turn_number, queen.queen_id, queen.objective)
+
+    def log_queen_remarks(self, queen, remarks, turn=None):
+        turn = self.turn_number if turn is None else turn
+        log_entry = f"Turn {turn} | Hive {queen.hive.hive_id} | Objective Updated: {queen.objective}\nRemarks: {remarks}"
+        self._log_event(EVENT_OBJECTIVE, queen.hive, log_entry, diary=True, turn=turn)
 
-        log_entry = f"Turn {self.turn_number} | Hive {queen.hive.hive_id} | Objective Updated: {queen.objective}\nRemarks: {parsed_data['remarks']}"
-        queen.hive.diaries.append(log_entry)
+    def _log_event(self, kind, hive, text, diary=False, turn=None):
+        ref = self.events.append(text, kind, self.turn_number if turn is None else turn, hive.hive_id, hive.faction)
+        if diary: hive.diaries.add(ref)
 
     def _get_random_enemy_hive(self, attacking_faction):
-        enemies = [h for h in self.map.hives if h.faction != attacking_faction and not h.is_destroyed]
-        return random.choice(enemies) if enemies else None
+        enemies = self.map.enemy_hives(attacking_faction)
+        return self.rng.choice(enemies) if enemies else None
 
     def _determine_queen_action(self, hive, queen):
         obj = queen.objective
@@ -95,7 +318,7 @@ class GameEngine:
                 queen.action_queued = constants.ACTION_GATHER_FOOD
             elif hive.workers < 25:
                 queen.action_queued = constants.ACTION_PRODUCE_WORKERS
-            elif hive.food >= constants.COST_QUEEN and len(self.map.hives) < constants.MAX_HIVES:
+            elif hive.food >= constants.COST_QUEEN and len(self.map.hives) < self.max_hives:
                 queen.action_queued = constants.ACTION_PRODUCE_QUEEN
             else:
                 queen.action_queued = constants.ACTION_GATHER_FOOD
@@ -121,36 +344,79 @@ class GameEngine:
                 queen.action_queued = constants.ACTION_PRODUCE_WARRIORS
             elif hive.warriors >= 15:
                 queen.action_queued = constants.ACTION_ATTACK
-            elif hive.food >= constants.COST_QUEEN and len(self.map.hives) < constants.MAX_HIVES:
+            elif hive.food >= constants.COST_QUEEN and len(self.map.hives) < self.max_hives:
                 queen.action_queued = constants.ACTION_PRODUCE_QUEEN
             else:
                 queen.action_queued = constants.ACTION_GATHER_FOOD
 
     def _get_valid_spawn_location(self, origin_hive):
         for _ in range(20): 
-            angle = random.uniform(0, 2 * math.pi)
-            distance = random.uniform(150, 250) 
+            angle = self.rng.uniform(0, 2 * math.pi)
+            distance = self.rng.uniform(150, 250) 
             new_x = origin_hive.x + distance * math.cos(angle)
             new_y = origin_hive.y + distance * math.sin(angle)
             
-            new_x = max(40, min(constants.MAP_WIDTH - 80, new_x))
-            new_y = max(40, min(constants.MAP_HEIGHT - 80, new_y))
+            new_x = max(40, min(self.map.width - 80, new_x))
+            new_y = max(40, min(self.map.height - 80, new_y))
             
-            valid = True
-            for other_hive in self.map.hives:
-                if math.hypot(new_x - other_hive.x, new_y - other_hive.y) < 120: 
-                    valid = False
-                    break
-            if valid:
+            if not self.map.is_crowded(new_x, new_y):
                 return new_x, new_y
         return None 
 
+    # --- UPDATED: Simultaneous Combat Resolution ---
+    def _resolve_combat(self, attackers):
+        """Every attack of the turn lands at once. Targets are drawn in attacker order,
+        then each target's attackers pool their power (warriors x attack_multiplier)
+        against its home warriors x defense_multiplier. A hive that attacked this turn
+        has no warriors at home. Results don't depend on which attack came first."""
+        intents = []
+        engagements = {} # target -> [(attacker, power)], in order of first attack
+        for hive in attackers:
+            target = self._get_random_enemy_hive(hive.faction)
+            if target:
+                power = hive.warriors * hive.attack_multiplier
+                intents.append((hive, target, power))
+                engagements.setdefault(target, []).append((hive, power))
+        attacking = {hive for hive, _, _ in intents}
+
+        # Every number is read before anything is written back
+        defense = {target: (0 if target in attacking else target.warriors) * target.defense_multiplier for target in engagements}
+        for hive, target, power in intents:
+            log_entry = f"--> COMBAT: Hive {hive.hive_id} ({power} Pwr) attacked Hive {target.hive_id} ({defense[target]} Pwr)!"
+            self._log_event(EVENT_COMBAT, hive, log_entry, diary=True)
+
+        for target, group in engagements.items():
+            attack_power = sum(power for _, power in group)
+            defense_power = defense[target]
+            if attack_power >= defense_power:
+                # Attackers break the defense; survivors split the leftover power by contribution (round up)
+                surviving_power = attack_power - defense_power
+                damage = 0
+                for hive, power in group:
+                    hive.warriors = -(-surviving_power * power // (attack_power * hive.attack_multiplier))
+                    damage += hive.warriors
+                if target not in attacking: target.warriors = 0
+
+                if damage >= target.workers:
+                    target.workers = 0
+                    self.map.destroy_hive(target)
+                    overrun_by = ", ".join(str(hive.hive_id) for hive, _ in group)
+                    self._log_event(EVENT_DESTROYED, target, f"--> DESTROYED: Hive {target.hive_id} ({target.faction}) was overrun by Hive {overrun_by}")
+                else:
+                    target.workers -= damage
+            else:
+                # Defenders hold the line
+                target.warriors = -(-(defense_power - attack_power) // target.defense_multiplier)
+                for hive, _ in group:
+                    hive.warriors = 0
+
     def end_turn(self):
         for hive in self.map.hives:
             if not hive.is_destroyed:
                 for queen in hive.queens:
                     self._determine_queen_action(hive, queen)
 
+        attackers = []
         for hive in self.map.hives:
             if hive.is_destroyed: continue
             
@@ -164,54 +430,93 @@ class GameEngine:
                 elif action == constants.ACTION_PRODUCE_WARRIORS and hive.food >= constants.COST_WARRIOR:
                     hive.food -= constants.COST_WARRIOR
                     hive.warriors += 1
-                elif action == constants.ACTION_PRODUCE_QUEEN and hive.food >= constants.COST_QUEEN and len(self.map.hives) < constants.MAX_HIVES:
+                elif action == constants.ACTION_PRODUCE_QUEEN and hive.food >= constants.COST_QUEEN and len(self.map.hives) < self.max_hives:
                     spawn_loc = self._get_valid_spawn_location(hive)
                     if spawn_loc:
                         hive.food -= constants.COST_QUEEN
-                        new_hive = Hive(self._next_hive_id, spawn_loc[0], spawn_loc[1], hive.faction)
+                        new_hive = Hive(self._next_hive_id, spawn_loc[0], spawn_loc[1], hive.faction, self.events)
                         self._next_hive_id += 1
                         new_queen = Queen(new_hive, self._next_queen_id)
                         self._next_queen_id += 1
                         new_hive.queens.append(new_queen)
-                        self.map.hives.append(new_hive)
+                        self.map.add_hive(new_hive)
+                        self._log_event(EVENT_SPAWN, new_hive, f"--> SPAWN: Hive {hive.hive_id} founded Hive {new_hive.hive_id} ({new_hive.faction})")
                 
-                # --- UPDATED: Advanced Combat Resolution ---
+                # Attacks only declare intent here; they all land together in _resolve_combat
                 elif action == constants.ACTION_ATTACK and hive.warriors > 0:
-                    target = self._get_random_enemy_hive(hive.faction)
-                    if target:
-                        # Calculate raw power
-                        attack_power = hive.warriors * hive.attack_multiplier
-                        defense_power = target.warriors * target.defense_multiplier
-                        
-                        log_entry = f"--> COMBAT: Hive {hive.hive_id} ({attack_power} Pwr) attacked Hive {target.hive_id} ({defense_power} Pwr)!"
-                        hive.diaries.append(log_entry)
-                        
-                        if attack_power >= defense_power:
-                            # Attackers break the defense
-                            surviving_power = attack_power - defense_power
-                            target.warriors = 0
-                            
-                            # Convert surviving power back to raw units (round up)
-                            surviving_attackers = math.ceil(surviving_power / hive.attack_multiplier)
-                            
-                            if surviving_attackers >= target.workers:
-                                target.workers = 0
-                                target.is_destroyed = True 
-                            else:
-                                target.workers -= surviving_attackers
-                            
-                            hive.warriors = surviving_attackers 
-                        else:
-                            # Defenders hold the line
-                            surviving_power = defense_power - attack_power
-                            
-                            # Convert surviving power back to defending units
-                            target.warriors = math.ceil(surviving_power / target.defense_multiplier)
-                            hive.warriors = 0
+                    attackers.append(hive)
                 queen.action_queued = None
 
+        self._resolve_combat(attackers)
+
+        # Gathering happens after the fighting, so overrun hives don't harvest
+        for hive in self.map.hives:
             if not hive.is_destroyed:
                 hive.food += int(hive.workers * constants.GATHER_RATE_BASE * hive.gathering_modifier)
 
-        self.map.hives = [h for h in self.map.hives if not h.is_destroyed]
-        self.turn_number += 1
\ No newline at end of file
+        self.map.remove_destroyed()
+        self.turn_number += 1
+        if self.recorder: self.recorder.turn_ended(self)
+
+    # ==========================================
+    # STATE SNAPSHOTS
+    # ==========================================
+    # Plain lists/tuples only, in the same layout for both engines, so a
+    # snapshot can be stored in a replay file or restored into either engine.
+    # With events=True the whole EventLog and each diary's refs come along
+    # (checkpoints); without it only the diary text does (replay snapshots).
+
+    def get_state(self, events=True):
+        hives = []
+        diaries = []
+        for hive in self.map.hives:
+            if hive.is_destroyed: continue
+            hives.append((hive.hive_id, hive.x, hive.y, hive.faction, hive.food, hive.workers, hive.warriors,
+                          hive.gathering_modifier, hive.attack_multiplier, hive.defense_multiplier,
+                          [(queen.queen_id, queen.objective) for queen in hive.queens], list(hive.diaries)))
+            if events: diaries.append(hive.diaries.get_state())
+        state = {
+            "turn_number": self.turn_number,
+            "next_hive_id": self._next_hive_id,
+            "next_queen_id": self._next_queen_id,
+            "max_hives": self.max_hives,
+            "map_size": (self.map.width, self.map.height),
+            "seed": self.seed,
+            "rng": self.rng.getstate(),
+            "hives": hives,
+            "queue": [queen.queen_id for queen in self.active_queens_queue],
+        }
+        if events:
+            state["events"] = self.events.get_state()
+            state["diaries"] = diaries
+        return state
+
+    def set_state(self, state):
+        width, height = state["map_size"]
+        self.map = Map(width, height)
+        self.events = EventLog.from_state(state["events"]) if "events" in state else EventLog()
+        self.max_hives = state["max_hives"]
+        self.turn_number = state["turn_number"]
+        self._next_hive_id = state["next_hive_id"]
+        self._next_queen_id = state["next_queen_id"]
+        self.seed = state["seed"]
+        version, internal, gauss = state["rng"]
+        self.rng.setstate((version, tuple(internal), gauss))
+
+        queens_by_id = {}
+        for row, (hive_id, x, y, faction, food, workers, warriors, modifier, attack, defense, queens, diaries) in enumerate(state["hives"]):
+            hive = Hive(hive_id, x, y, faction, self.events)
+            hive.food, hive.workers, hive.warriors = food, workers, warriors
+            hive.gathering_modifier = modifier
+            hive.attack_multiplier, hive.defense_multiplier = attack, defense
+            if "events" in state:
+                hive.diaries = Diary.from_state(self.events, *state["diaries"][row])
+            else:
+                hive.diaries = restore_diary(self.events, hive_id, faction, diaries)
+            for queen_id, objective in queens:
+                queen = Queen(hive, queen_id)
+                queen.objective = objective
+                hive.queens.append(queen)
+                queens_by_id[queen_id] = queen
+            self.map.add_hive(hive)
+        self.active_queens_queue = [queens_by_id[queen_id] for queen_id in state["queue"]]
\ No newline at end of file
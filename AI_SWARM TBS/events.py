@@ -0,0 +1,183 @@
+# events.py
+# Match-wide, append-only event log. Every typed event (objective change,
+# combat, spawn, destruction) is stored once, in chronological order, and
+# addressed by its integer position (a "ref"). The log keeps per-kind,
+# per-turn and per-hive indexes, so "latest K" and filtered range queries
+# never scan the whole match. Each hive's diary is only a short ring buffer
+# of refs to its newest lines, so memory per hive stays flat no matter how
+# long the match runs.
+import array
+from collections import namedtuple
+import constants
+
+EVENT_OBJECTIVE = "objective"
+EVENT_COMBAT = "combat"
+EVENT_SPAWN = "spawn"
+EVENT_DESTROYED = "destroyed"
+EVENT_KINDS = [EVENT_OBJECTIVE, EVENT_COMBAT, EVENT_SPAWN, EVENT_DESTROYED]
+
+Event = namedtuple("Event", "ref kind turn hive_id faction text")
+
+class EventLog:
+    __slots__ = ("texts", "kinds", "turns", "hive_ids", "factions", "_by_kind", "_by_turn", "_by_hive")
+
+    def __init__(self):
+        # Columns, one row per event
+        self.texts = []
+        self.kinds = array.array("b")
+        self.turns = array.array("i")
+        self.hive_ids = array.array("q")
+        self.factions = []
+        # Indexes: key -> refs in append order
+        self._by_kind = {kind: array.array("q") for kind in EVENT_KINDS}
+        self._by_turn = {}
+        self._by_hive = {}
+
+    def append(self, text, kind=EVENT_OBJECTIVE, turn=0, hive_id=0, faction=None):
+        ref = len(self.texts)
+        self.texts.append(text)
+        self.kinds.append(EVENT_KINDS.index(kind))
+        self.turns.append(turn)
+        self.hive_ids.append(hive_id)
+        self.factions.append(faction)
+        self._by_kind[kind].append(ref)
+        self._by_turn.setdefault(turn, array.array("q")).append(ref)
+        self._by_hive.setdefault(hive_id, array.array("q")).append(ref)
+        return ref
+
+    def __getitem__(self, ref):
+        return self.texts[ref]
+
+    def __len__(self):
+        return len(self.texts)
+
+    def event(self, ref):
+        return Event(ref, EVENT_KINDS[self.kinds[ref]], self.turns[ref], self.hive_ids[ref], self.factions[ref], self.texts[ref])
+
+    def _matches(self, ref, kinds, hive_id, faction):
+        return ((kinds is None or EVENT_KINDS[self.kinds[ref]] in kinds)
+                and (hive_id is None or self.hive_ids[ref] == hive_id)
+                and (faction is None or self.factions[ref] == faction))
+
+    def latest(self, count, kinds=None, hive_id=None, faction=None):
+        """The newest `count` matching events, oldest first. Unfiltered, single-kind
+        and single-hive queries walk an index backwards and stop after `count`."""
+        if count <= 0: return []
+        if hive_id is not None:
+            candidates = self._by_hive.get(hive_id, ())
+        elif kinds is not None and len(kinds) == 1:
+            candidates = self._by_kind[kinds[0]]
+        else:
+            candidates = range(len(self.texts))
+
+        picked = []
+        for ref in reversed(candidates):
+            if self._matches(ref, kinds, hive_id, faction):
+                picked.append(ref)
+                if len(picked) == count: break
+        return [self.event(ref) for ref in reversed(picked)]
+
+    def between(self, first_turn, last_turn, kinds=None, hive_id=None, faction=None):
+        """Matching events with first_turn <= turn <= last_turn, in log order."""
+        if hive_id is not None:
+            refs = [ref for ref in self._by_hive.get(hive_id, ()) if first_turn <= self.turns[ref] <= last_turn]
+        else:
+            refs = []
+            for turn in range(first_turn, last_turn + 1):
+                refs.extend(self._by_turn.get(turn, ()))
+            refs.sort() # Late remarks can be logged under an earlier turn
+        return [self.event(ref) for ref in refs if self._matches(ref, kinds, hive_id, faction)]
+
+    def count(self, kind, faction=None):
+        if faction is None:
+            return len(self._by_kind[kind])
+        return sum(1 for ref in self._by_kind[kind] if self.factions[ref] == faction)
+
+    # Plain lists, one per column; from_state rebuilds the indexes
+    def get_state(self):
+        return {
+            "texts": list(self.texts),
+            "kinds": self.kinds.tolist(),
+            "turns": self.turns.tolist(),
+            "hive_ids": self.hive_ids.tolist(),
+            "factions": list(self.factions),
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        log = cls()
+        for text, kind, turn, hive_id, faction in zip(state["texts"], state["kinds"], state["turns"], state["hive_ids"], state["factions"]):
+            log.append(text, EVENT_KINDS[kind], turn, hive_id, faction)
+        return log
+
+
+class Diary:
+    """A hive's newest `maxlen` log lines. Reads like the list it replaces
+    (len, iteration, indexing and slicing return text)."""
+    # A plain list used as a ring: a deque block alone outweighs a whole slotted Hive
+    __slots__ = ("log", "maxlen", "refs", "written")
+
+    def __init__(self, log, maxlen=constants.DIARY_LENGTH):
+        self.log = log
+        self.maxlen = maxlen
+        self.refs = []
+        self.written = 0 # Lines ever added, including those that fell off the buffer
+
+    def add(self, ref):
+        if len(self.refs) < self.maxlen:
+            self.refs.append(ref)
+        else:
+            self.refs[self.written % self.maxlen] = ref # Overwrite the oldest
+        self.written += 1
+
+    def _ordered_refs(self):
+        refs = self.refs
+        if len(refs) < self.maxlen:
+            return refs
+        start = self.written % self.maxlen
+        return refs[start:] + refs[:start]
+
+    def since(self, written):
+        """Lines added after the diary's `written` count was `written`, as far as
+        the buffer still holds them, plus whether some already fell off."""
+        new = self.written - written
+        if new <= 0: return [], False
+        return self[-new:], new > len(self.refs)
+
+    def get_state(self):
+        return list(self._ordered_refs()), self.written
+
+    @classmethod
+    def from_state(cls, log, refs, written, maxlen=constants.DIARY_LENGTH):
+        diary = cls(log, maxlen)
+        refs = list(refs)[-maxlen:]
+        if len(refs) == maxlen:
+            # Put each ref back in the slot add() would have used, oldest at written % maxlen
+            start = written % maxlen
+            refs = refs[maxlen - start:] + refs[:maxlen - start]
+        diary.refs = refs
+        diary.written = written
+        return diary
+
+    def __len__(self):
+        return len(self.refs)
+
+    def __iter__(self):
+        log = self.log
+        return (log[r] for r in self._ordered_refs())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.log[r] for r in self._ordered_refs()[index]]
+        return self.log[self._ordered_refs()[index]]
+
+
+def restore_diary(log, hive_id, faction, texts):
+    # Replay snapshots keep only the diary text (checkpoints save the whole log):
+    # the kind is recovered from the line format and the events are filed under
+    # turn 0 ("before the restore"), so a log rebuilt this way has no history
+    diary = Diary(log)
+    for text in texts:
+        kind = EVENT_COMBAT if text.startswith("--> COMBAT") else EVENT_OBJECTIVE
+        diary.add(log.append(text, kind, 0, hive_id, faction))
+    return diary
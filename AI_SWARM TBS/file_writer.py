@@ -0,0 +1,107 @@
+# file_writer.py
+# Moves journal/memory disk writes off the game thread. Writes are queued,
+# batched, and flushed every WRITER_FLUSH_INTERVAL seconds and at shutdown.
+# Whole-file replacements go through a temp file + rename, so a crash can
+# never leave memory.txt half written.
+import atexit
+import os
+import queue
+import threading
+import time
+import constants
+
+_STOP = object()
+
+def atomic_write(path, text):
+    # str is written as text, bytes (checkpoints) as binary
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb" if isinstance(text, bytes) else "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class AsyncFileWriter:
+    def __init__(self, flush_interval=constants.WRITER_FLUSH_INTERVAL, max_queue=constants.WRITER_QUEUE_SIZE):
+        self.flush_interval = flush_interval
+        # Bounded: if the disk falls far behind, producers block instead of eating memory
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self.batches = 0
+        self.writes = 0
+        self._thread = threading.Thread(target=self._run, name="file-writer", daemon=True)
+        self._thread.start()
+        # Daemon threads die abruptly at exit; close() drains the queue first
+        atexit.register(self.close)
+
+    def append(self, path, text):
+        self._put(("append", path, text))
+
+    def replace(self, path, text):
+        self._put(("replace", path, text))
+
+    def _put(self, item):
+        if self._closed:
+            self._write([item]) # Late writers (e.g. a post-mortem finishing after close) write directly
+        else:
+            self._queue.put(item)
+
+    def flush(self):
+        """Blocks until everything queued so far is on disk."""
+        if self._closed: return
+        done = threading.Event()
+        self._queue.put(("flush", None, done))
+        done.wait()
+
+    def close(self):
+        if self._closed: return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._write(batch)
+                return
+            if item is not None and item[0] == "flush":
+                self._write(batch)
+                batch = []
+                item[2].set()
+            elif item is not None:
+                batch.append(item)
+
+            if time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, batch):
+        if not batch: return
+        appends = {} # path -> texts, in arrival order
+        for kind, path, text in batch:
+            if kind == "replace":
+                appends.pop(path, None) # Appends queued before a rewrite would be overwritten anyway
+                try:
+                    atomic_write(path, text)
+                except OSError as e:
+                    print(f"File Writer Error ({path}): {str(e)}")
+            else:
+                appends.setdefault(path, []).append(text)
+
+        for path, texts in appends.items():
+            try:
+                with open(path, "a") as f:
+                    f.write("".join(texts))
+            except OSError as e:
+                print(f"File Writer Error ({path}): {str(e)}")
+        self.batches += 1
+        self.writes += len(batch)
@@ -0,0 +1,425 @@
+# game_controller.py
+# Runs the engine and all LLM orchestration on its own thread. The pygame loop
+# in main.py only renders the latest GameSnapshot and forwards user input as
+# commands, so a slow frame never delays a turn and a slow turn (end_turn,
+# parsing) never freezes the window.
+import queue
+import threading
+import time
+from collections import namedtuple
+import constants
+from engine import GameEngine
+from llm_api import OllamaConnector
+from decision_gate import DecisionGate
+from model_router import ModelRouter
+from scheduler import PrefetchScheduler
+from replay import ReplayRecorder
+from checkpoint import Autosaver, load_checkpoint
+
+# Immutable views handed to the UI thread. Never mutated after publishing.
+HiveSnapshot = namedtuple("HiveSnapshot", "hive_id x y faction objective food workers warriors")
+GameSnapshot = namedtuple("GameSnapshot", [
+    "turn_number", "max_hives", "hives", "recent_diaries",
+    "prompt_message", "error_message", "is_generating", "auto_play", "active_instruction",
+    "game_over", "game_over_message", "is_victory", "is_analyzing", "turbo",
+])
+
+# Commands the UI thread can send (the first two match UIManager's action signals)
+CMD_ASK = "OLLAMA_CLICK"
+CMD_AUTOPLAY_TOGGLE = "AUTOPLAY_TOGGLE"
+CMD_TURBO_TOGGLE = "TURBO_TOGGLE"
+CMD_ADVICE = "ADVICE"
+
+def apply_decision(engine, ollama, decision_gate, queen, parsed_data, active_instruction, router=None):
+    ollama.add_journal_entry(
+        turn=engine.turn_number,
+        hive_id=queen.hive.hive_id,
+        queen_id=queen.queen_id,
+        remarks=parsed_data["remarks"]
+    )
+    engine.process_queen_command(queen, parsed_data)
+    engine.active_queens_queue.remove(queen)
+    if decision_gate: decision_gate.record(queen, engine, active_instruction)
+    if router: router.note_success(queen.queen_id) # Any applied decision clears an earlier parse failure
+
+
+class GameController:
+    def __init__(self, engine=None, ollama=None, decision_source=None, resume=None):
+        self.engine = engine or GameEngine()
+        self.ollama = ollama or OllamaConnector(model_name=constants.LLM_MODEL_LARGE)
+        if resume:
+            # Checkpoints are taken between turns, so the resumed turn starts normally below
+            load_checkpoint(resume, self.engine, self.ollama)
+        # Optional headless.py-style source (scripted/random) that answers instead of Ollama during auto-play
+        self.decision_source = decision_source
+        self.router = ModelRouter() if constants.ROUTER_ENABLED else None
+        self.decision_gate = DecisionGate() if constants.GATE_ENABLED else None
+        self.scheduler = PrefetchScheduler(self.ollama, router=self.router)
+
+        self.commands = queue.Queue() # (command, payload) from the UI thread
+        self.snapshot = None # Latest GameSnapshot; replaced wholesale, never edited
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="game-controller", daemon=True)
+
+        self.prompt_message = ""
+        self.error_message = ""
+        self.auto_play_enabled = False
+        self.game_over = False
+        self.game_over_message = ""
+        self.is_victory = False
+        self._was_analyzing = False
+
+        # --- NEW: Turbo mode. No turn pacing; snapshots are published every N turns / M ms ---
+        self.turbo = False
+        self._published_turn = 0
+        self._published_at = 0.0
+        self._unpublished = False
+
+        self.active_instruction = ""
+        self.consecutive_errors = 0
+        self.batch_fallback = False # Set once this turn's batched request left queens unparsed
+        self.pending_request = None # request_id of the decision we are waiting on
+        self.streaming_remarks = {} # request_id -> (queen, turn, early parse) whose REMARKS are still streaming
+        self.gated_queens = set() # Queen IDs the decision gate already looked at this turn
+        self._last_turn_end = 0.0
+
+        # --- NEW: Seed + objective log, so the match can be replayed without the model ---
+        self.recorder = ReplayRecorder(self.engine, constants.REPLAY_FILE, self.ollama.writer) if constants.REPLAY_ENABLED else None
+        self.autosaver = Autosaver() if constants.CHECKPOINT_ENABLED else None
+
+        self.engine.start_turn()
+        self.ollama.begin_turn()
+        if self.router: self.router.observe_turn(self.engine)
+        self._publish()
+
+    # ==========================================
+    # THREAD CONTROL
+    # ==========================================
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def send(self, command, payload=None):
+        self.commands.put((command, payload))
+
+    def close(self):
+        print(self.ollama.metrics.summary())
+        print(self.ollama.retry_metrics.summary())
+        print(self.ollama.parse_metrics.summary())
+        if self.decision_gate: print(self.decision_gate.summary())
+        print(self.ollama.decision_cache.summary())
+        if self.router: print(self.router.summary())
+        print(self.scheduler.summary())
+        if self.recorder: self.recorder.close(self.engine)
+        if self.autosaver:
+            self.autosaver.close()
+            print(self.autosaver.summary())
+        self.ollama.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self.step():
+                self._unpublished = True
+                if self._should_publish():
+                    self._publish()
+            else:
+                if self._unpublished:
+                    self._publish() # Idle: make sure the UI shows where we stopped
+                time.sleep(constants.SIM_IDLE_SECONDS) # Waiting on Ollama or the user
+
+    def _should_publish(self):
+        if not self.turbo or self.game_over:
+            return True
+        if self.engine.turn_number - self._published_turn >= constants.TURBO_RENDER_EVERY_TURNS:
+            return True
+        return (time.monotonic() - self._published_at) * 1000 >= constants.TURBO_RENDER_INTERVAL_MS
+
+    # ==========================================
+    # SIMULATION
+    # ==========================================
+    def step(self):
+        """One pass of orchestration. Returns True if anything the UI shows may have changed."""
+        engine = self.engine
+        if self.game_over:
+            return self._step_game_over()
+
+        player_hives = engine.map.hive_count(constants.FACTION_PLAYER)
+        enemy_hives = engine.map.hive_count(constants.FACTION_ENEMY)
+        if player_hives == 0:
+            self.game_over = True
+            self.is_victory = False
+            self.game_over_message = "DEFEAT! The Hive Mind has been eradicated."
+            return True
+        elif enemy_hives == 0:
+            self.game_over = True
+            self.is_victory = True
+            self.game_over_message = "VICTORY! The enemy has been consumed."
+            return True
+
+        if not engine.active_queens_queue:
+            # Paced so fully gated turns stay watchable (turbo runs flat out)
+            if not self.turbo and time.monotonic() - self._last_turn_end < constants.SIM_MIN_TURN_SECONDS:
+                return False
+            self._end_turn()
+            return True
+
+        current_queen = engine.active_queens_queue[0]
+        self.prompt_message = f"Turn {engine.turn_number}: Awaiting orders for Queen {current_queen.queen_id} (Hive {current_queen.hive.hive_id})"
+
+        changed = self._handle_commands(current_queen)
+        changed = self._request_decisions() or changed
+        changed = self._handle_results() or changed
+        return changed
+
+    def _step_game_over(self):
+        ollama = self.ollama
+        # Scripted/random matches teach the Hive Mind nothing, so they skip the post-mortem
+        if self.decision_source is None and not ollama.post_mortem_done and not ollama.is_analyzing:
+            ollama.run_post_mortem(self.engine, self.is_victory)
+        changed = ollama.is_analyzing != self._was_analyzing
+        self._was_analyzing = ollama.is_analyzing
+        return changed
+
+    def _end_turn(self):
+        self.scheduler.reset()
+        self.engine.end_turn()
+        if self.autosaver: self.autosaver.turn_ended(self.engine, self.ollama)
+        self.engine.start_turn()
+        self.ollama.begin_turn()
+        if self.router: self.router.observe_turn(self.engine)
+        self.error_message = ""
+        self.batch_fallback = False
+        self.gated_queens.clear()
+        self._last_turn_end = time.monotonic()
+
+    def _handle_commands(self, current_queen):
+        changed = False
+        while True:
+            try:
+                command, payload = self.commands.get_nowait()
+            except queue.Empty:
+                return changed
+            changed = True
+
+            if command == CMD_AUTOPLAY_TOGGLE:
+                self.auto_play_enabled = not self.auto_play_enabled
+                if self.auto_play_enabled:
+                    self.consecutive_errors = 0 # Reset strikes when turned on
+
+            elif command == CMD_TURBO_TOGGLE:
+                self.turbo = not self.turbo
+
+            # --- FEATURE 2: Update the Advisor Instruction ---
+            elif command == CMD_ADVICE:
+                self.active_instruction = payload
+                self.scheduler.set_instruction(self.active_instruction)
+
+            # Trigger Ollama (Manual Click)
+            elif command == CMD_ASK and self.pending_request is None:
+                self.error_message = ""
+                self.pending_request = self.ollama.request_action(current_queen, self.engine, self.active_instruction, use_cache=False)
+
+    def _request_decisions(self):
+        # Trigger Ollama (Auto-Play)
+        engine = self.engine
+        if not self.auto_play_enabled or self.pending_request is not None:
+            return False
+
+        # --- NEW: Queens whose situation hasn't materially changed keep their objective, no model call ---
+        changed = False
+        if self.decision_gate:
+            for queen in list(engine.active_queens_queue):
+                if queen.queen_id in self.gated_queens: continue
+                self.gated_queens.add(queen.queen_id)
+                if not self.decision_gate.should_query(queen, engine, self.active_instruction):
+                    engine.active_queens_queue.remove(queen)
+                    changed = True
+        current_queen = engine.active_queens_queue[0] if engine.active_queens_queue else None
+
+        if current_queen is None:
+            pass # Every queen was skipped; the turn ends next step
+        elif self.decision_source is not None:
+            self._decide_locally()
+            changed = True
+        elif constants.LLM_BATCH_DECISIONS and len(engine.active_queens_queue) > 1 and not self.batch_fallback:
+            self.error_message = ""
+            queens = list(engine.active_queens_queue)
+            model = self.router.choose(queens) if self.router else None
+            self.pending_request = self.ollama.request_batch_action(queens, engine, self.active_instruction, model=model)
+            changed = True
+        # --- NEW: Individual requests are pipelined for the next few queens in the queue ---
+        elif self.scheduler.fill(engine.active_queens_queue, engine, self.active_instruction):
+            self.error_message = ""
+            changed = True
+        return changed
+
+    def _decide_locally(self):
+        # Scripted/random sources answer synchronously, like headless.run_match
+        engine = self.engine
+        for queen in list(engine.active_queens_queue):
+            parsed_data = self.decision_source.decide(queen, engine)
+            if parsed_data["status"] == "success":
+                engine.process_queen_command(queen, parsed_data)
+                if self.decision_gate: self.decision_gate.record(queen, engine, self.active_instruction)
+            elif parsed_data["status"] == "error":
+                self.error_message = parsed_data["message"]
+                self.auto_play_enabled = False
+                return
+            engine.active_queens_queue.remove(queen)
+
+    def _find_queued_queen(self, queen_id):
+        return next((q for q in self.engine.active_queens_queue if q.queen_id == queen_id), None)
+
+    def _handle_results(self):
+        engine, ollama, router, decision_gate = self.engine, self.ollama, self.router, self.decision_gate
+        changed = False
+
+        # --- NEW: Drain the connector's completion queue ---
+        # Pipelined replies are held back until every queen ahead of them has been handled
+        for result in self.scheduler.release(ollama.poll_results(), engine.active_queens_queue):
+            changed = True
+            if router and not (result.cached or result.partial or result.error):
+                router.record_latency(result.model, result.elapsed)
+
+            # --- NEW: Final text for a queen whose objective was already applied early ---
+            if result.request_id in self.streaming_remarks:
+                queen, turn, early_parsed = self.streaming_remarks.pop(result.request_id)
+                parsed_data = ollama.parse_result(result) if result.text else early_parsed
+                remarks = parsed_data["remarks"] if parsed_data["status"] == "success" else early_parsed["remarks"]
+                ollama.add_journal_entry(turn=turn, hive_id=queen.hive.hive_id, queen_id=queen.queen_id, remarks=remarks)
+                engine.log_queen_remarks(queen, remarks, turn)
+                ollama.remember_decision(result, queen.queen_id, dict(early_parsed, remarks=remarks))
+                continue
+
+            # --- NEW: Decision cache hit, already parsed ---
+            if result.cached:
+                if result.request_id == self.pending_request:
+                    self.pending_request = None
+                queen = self._find_queued_queen(result.queen_ids[0])
+                if queen is not None:
+                    apply_decision(engine, ollama, decision_gate, queen, result.parsed, self.active_instruction, router)
+                continue
+
+            if result.request_id == self.pending_request:
+                self.pending_request = None
+            elif result.request_id != self.scheduler.released:
+                continue # Stale or cancelled request
+
+            # --- NEW: Streamed ACTION arrived; apply it now and let the diary finish in the background ---
+            if result.partial:
+                queen = self._find_queued_queen(result.queen_ids[0])
+                if queen is not None:
+                    self.consecutive_errors = 0
+                    engine.set_queen_objective(queen, result.parsed["action"])
+                    engine.active_queens_queue.remove(queen)
+                    if decision_gate: decision_gate.record(queen, engine, self.active_instruction)
+                    if router: router.note_success(queen.queen_id)
+                    self.streaming_remarks[result.request_id] = (queen, engine.turn_number, result.parsed)
+                    self.error_message = ""
+                continue
+
+            if result.error:
+                if router and router.note_error(result.model):
+                    continue # Retried on the large model next step
+                self.error_message = result.error
+                self.auto_play_enabled = False
+                continue
+
+            # --- NEW: Batched response covering several queens ---
+            if result.kind == "batch":
+                batch_results = ollama.parse_result(result)
+
+                for queen in list(engine.active_queens_queue):
+                    parsed_data = batch_results.get(queen.queen_id)
+                    if parsed_data and parsed_data["status"] == "success":
+                        ollama.remember_decision(result, queen.queen_id, parsed_data)
+                        apply_decision(engine, ollama, decision_gate, queen, parsed_data, self.active_instruction, router)
+
+                # --- NEW: Ask for just the missing blocks before splitting the batch up ---
+                leftover = [q.queen_id for q in engine.active_queens_queue if q.queen_id in result.queen_ids]
+                if leftover and result.attempt < constants.LLM_MAX_CORRECTIONS:
+                    errors = "\n".join(f"Queen {qid}: {batch_results[qid]['message']}" for qid in leftover)
+                    self.pending_request = ollama.request_correction(result, errors, leftover)
+                    continue
+
+                # Anyone left over gets asked individually for the rest of the turn
+                if engine.active_queens_queue:
+                    self.batch_fallback = True
+                    if router:
+                        for queen in engine.active_queens_queue: router.note_parse_failure(queen.queen_id)
+                    print(f"Batch response left {len(engine.active_queens_queue)} Queen(s) unparsed. Falling back to individual requests.")
+                continue
+
+            queen = self._find_queued_queen(result.queen_ids[0])
+            if queen is None:
+                continue
+            parsed_data = ollama.parse_result(result)
+
+            if parsed_data["status"] == "success":
+                self.consecutive_errors = 0 # --- FEATURE 3: Reset strikes on success ---
+                ollama.remember_decision(result, queen.queen_id, parsed_data)
+                apply_decision(engine, ollama, decision_gate, queen, parsed_data, self.active_instruction, router)
+                self.error_message = ""
+            else:
+                self.error_message = parsed_data["message"]
+
+                # --- NEW: A short correction re-prompt comes first; only a reply that stays broken is a strike ---
+                if result.attempt < constants.LLM_MAX_CORRECTIONS:
+                    print(f"Queen {queen.queen_id}: {self.error_message} Sending correction {result.attempt + 1}/{constants.LLM_MAX_CORRECTIONS}.")
+                    self.pending_request = ollama.request_correction(result, self.error_message)
+                    continue
+
+                self.consecutive_errors += 1 # --- FEATURE 3: Add a strike ---
+                if router: router.note_parse_failure(queen.queen_id) # Retry on the large model
+
+                print("\n" + "="*50)
+                print(f"🚨 LLM ERROR (Strike {self.consecutive_errors}/3) 🚨")
+                print("="*50)
+                print(f"ERROR: {self.error_message}")
+                print("RAW LLM OUTPUT:")
+                print(result.text or "No text returned.")
+                print("="*50 + "\n")
+
+                # --- FEATURE 3: Disable after 3 fails ---
+                if self.consecutive_errors >= 3:
+                    self.auto_play_enabled = False
+                    print("Auto-Play Disabled due to 3 consecutive failures.")
+        return changed
+
+    # ==========================================
+    # SNAPSHOTS
+    # ==========================================
+    def _recent_diaries(self):
+        # The last 5 events of the match, in the order they happened (an O(1) index read)
+        return tuple(event.text for event in self.engine.events.latest(5))
+
+    def _publish(self):
+        engine = self.engine
+        self._published_turn = engine.turn_number
+        self._published_at = time.monotonic()
+        self._unpublished = False
+        hives = tuple(
+            HiveSnapshot(hive.hive_id, hive.x, hive.y, hive.faction, hive.queens[0].objective if hive.queens else None,
+                         hive.food, hive.workers, hive.warriors)
+            for hive in engine.map.hives
+        )
+        self.snapshot = GameSnapshot(
+            turn_number=engine.turn_number,
+            max_hives=engine.max_hives,
+            hives=hives,
+            recent_diaries=self._recent_diaries(),
+            prompt_message=self.prompt_message,
+            error_message=self.error_message,
+            is_generating=self.pending_request is not None or self.scheduler.busy,
+            auto_play=self.auto_play_enabled,
+            active_instruction=self.active_instruction,
+            game_over=self.game_over,
+            game_over_message=self.game_over_message,
+            is_victory=self.is_victory,
+            is_analyzing=self.ollama.is_analyzing,
+            turbo=self.turbo,
+        )
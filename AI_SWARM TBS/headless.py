@@ -0,0 +1,249 @@
+# headless.py
+# Runs matches without pygame so thousands of games can be simulated for
+# balance and memory experiments. Usage:
+#   python headless.py --matches 1000 --source random
+import argparse
+import os
+import random
+import time
+import constants
+from engine import GameEngine
+from replay import ReplayRecorder
+
+# ==========================================
+# DECISION SOURCES
+# ==========================================
+# A decision source returns the same dict shape as parser.parse_llm_command,
+# so GameEngine.process_queen_command can consume it unchanged.
+
+class ScriptedDecisionSource:
+    def __init__(self, objective=constants.OBJ_BALANCED):
+        self.action = f"Set Objective: {objective}"
+
+    def decide(self, queen, engine):
+        return {"status": "success", "target": constants.TARGET_QUEEN, "action": self.action, "remarks": ""}
+
+
+class RandomDecisionSource:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def decide(self, queen, engine):
+        action = self.rng.choice(constants.VALID_ACTIONS)
+        return {"status": "success", "target": constants.TARGET_QUEEN, "action": action, "remarks": ""}
+
+
+class LLMDecisionSource:
+    def __init__(self, connector, user_instructions="", max_retries=3, router=None):
+        self.connector = connector
+        self.user_instructions = user_instructions
+        self.max_retries = max_retries
+        self.router = router # Optional model_router.ModelRouter
+        self._routed_turn = None
+
+    def decide(self, queen, engine):
+        if self.router and self._routed_turn != engine.turn_number:
+            self.router.observe_turn(engine)
+            self._routed_turn = engine.turn_number
+
+        parsed_data = {"status": "error", "message": "No response."}
+        for _ in range(self.max_retries):
+            model = self.router.choose([queen]) if self.router else None
+            result = self.connector.request_action_blocking(queen, engine, self.user_instructions, model=model)
+            if result.error:
+                if self.router and self.router.note_error(result.model): continue
+                return {"status": "error", "message": result.error}
+            if self.router and not result.cached:
+                self.router.record_latency(result.model, result.elapsed)
+            parsed_data = result.parsed if result.cached else self.connector.parse_result(result)
+
+            # Short correction re-prompts before paying for another full prompt
+            while parsed_data["status"] != "success" and result.attempt < constants.LLM_MAX_CORRECTIONS:
+                result = self.connector.request_correction_blocking(result, parsed_data["message"])
+                if result.error: break
+                parsed_data = self.connector.parse_result(result)
+            if self.router:
+                if parsed_data["status"] == "success": self.router.note_success(queen.queen_id)
+                else: self.router.note_parse_failure(queen.queen_id)
+            if parsed_data["status"] == "success":
+                self.connector.remember_decision(result, queen.queen_id, parsed_data)
+                self.connector.add_journal_entry(engine.turn_number, queen.hive.hive_id, queen.queen_id, parsed_data["remarks"])
+                break
+        return parsed_data
+
+class GatedDecisionSource:
+    # Wraps another source; queens whose situation hasn't changed keep their objective
+    def __init__(self, source, gate):
+        self.source = source
+        self.gate = gate
+
+    def decide(self, queen, engine):
+        if not self.gate.should_query(queen, engine):
+            return {"status": "skipped"}
+        parsed_data = self.source.decide(queen, engine)
+        if parsed_data["status"] == "success":
+            engine.process_queen_command(queen, parsed_data)
+            self.gate.record(queen, engine)
+            return {"status": "applied"}
+        return parsed_data
+
+# ==========================================
+# MATCH RUNNER
+# ==========================================
+
+class MatchResult:
+    def __init__(self, winner, turns, decisions, elapsed, skipped=0):
+        self.winner = winner
+        self.turns = turns
+        self.decisions = decisions
+        self.elapsed = elapsed
+        self.skipped = skipped # Decisions the gate answered without asking the source
+
+    @property
+    def turns_per_second(self):
+        return self.turns / self.elapsed if self.elapsed > 0 else float("inf")
+
+
+def get_winner(engine):
+    player_hives = engine.map.hive_count(constants.FACTION_PLAYER)
+    enemy_hives = engine.map.hive_count(constants.FACTION_ENEMY)
+    if player_hives == 0:
+        return constants.FACTION_ENEMY
+    if enemy_hives == 0:
+        return constants.FACTION_PLAYER
+    return None
+
+
+def run_match(source, max_turns=500, engine=None, record_path=None):
+    """Plays one match to completion (or max_turns) as fast as the CPU allows."""
+    engine = engine or GameEngine()
+    recorder = ReplayRecorder(engine, record_path) if record_path else None
+    decisions = 0
+    skipped = 0
+    winner = None
+    start = time.perf_counter()
+
+    engine.start_turn()
+    while engine.turn_number <= max_turns:
+        winner = get_winner(engine)
+        if winner:
+            break
+
+        for queen in engine.active_queens_queue:
+            parsed_data = source.decide(queen, engine)
+            if parsed_data["status"] == "success":
+                engine.process_queen_command(queen, parsed_data)
+                decisions += 1
+            elif parsed_data["status"] == "applied":
+                decisions += 1
+            elif parsed_data["status"] == "skipped":
+                skipped += 1
+        engine.active_queens_queue.clear()
+
+        engine.end_turn()
+        engine.start_turn()
+    winner = winner or get_winner(engine) # Won on the last allowed turn
+
+    elapsed = time.perf_counter() - start
+    if recorder:
+        recorder.close(engine)
+        recorder.save()
+    return MatchResult(winner, engine.turn_number - 1, decisions, elapsed, skipped)
+
+
+def run_batch(source_factory, matches=100, max_turns=500, report_every=0, engine_factory=GameEngine, record_dir=None):
+    """Runs several matches back to back and aggregates throughput and outcomes."""
+    results = []
+    start = time.perf_counter()
+    if record_dir: os.makedirs(record_dir, exist_ok=True)
+    for i in range(matches):
+        record_path = os.path.join(record_dir, f"match_{i + 1:04d}.jsonl") if record_dir else None
+        results.append(run_match(source_factory(), max_turns, engine_factory(), record_path))
+        if report_every and (i + 1) % report_every == 0:
+            print(f"{i + 1}/{matches} matches done")
+    elapsed = time.perf_counter() - start
+
+    total_turns = sum(r.turns for r in results)
+    wins = {constants.FACTION_PLAYER: 0, constants.FACTION_ENEMY: 0, None: 0}
+    for r in results:
+        wins[r.winner] += 1
+
+    return {
+        "matches": matches,
+        "total_turns": total_turns,
+        "elapsed": elapsed,
+        "turns_per_second": total_turns / elapsed if elapsed > 0 else float("inf"),
+        "player_wins": wins[constants.FACTION_PLAYER],
+        "enemy_wins": wins[constants.FACTION_ENEMY],
+        "unfinished": wins[None],
+        "decisions": sum(r.decisions for r in results),
+        "skipped": sum(r.skipped for r in results),
+        "results": results,
+    }
+
+
+def build_source_factory(args):
+    if args.source == "scripted":
+        factory = lambda: ScriptedDecisionSource(args.objective)
+    elif args.source == "random":
+        factory = lambda: RandomDecisionSource(random.randrange(2 ** 32)) # Drawn like the engine seed, so --seed reproduces it
+    elif args.source == "llm":
+        from llm_api import OllamaConnector
+        connector = OllamaConnector(model_name=args.model)
+        router = None
+        if args.route:
+            from model_router import ModelRouter
+            router = ModelRouter(large_model=args.model)
+        factory = lambda: LLMDecisionSource(connector, args.advice, router=router)
+    else:
+        raise ValueError(f"Unknown decision source '{args.source}'")
+
+    if args.gate:
+        from decision_gate import DecisionGate
+        return lambda: GatedDecisionSource(factory(), DecisionGate())
+    return factory
+
+
+def build_engine_factory(args):
+    if args.engine == "vector":
+        from vector_engine import VectorGameEngine
+        engine_class = VectorGameEngine
+    else:
+        engine_class = GameEngine
+    return lambda: engine_class(max_hives=args.max_hives, map_width=args.map_width, map_height=args.map_height)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Run AI SWARM matches without rendering.")
+    arg_parser.add_argument("--matches", type=int, default=100)
+    arg_parser.add_argument("--max-turns", type=int, default=500)
+    arg_parser.add_argument("--source", choices=["scripted", "random", "llm"], default="random")
+    arg_parser.add_argument("--objective", default=constants.OBJ_BALANCED,
+                            choices=[constants.OBJ_BALANCED, constants.OBJ_AGGRESSIVE, constants.OBJ_ECONOMY])
+    arg_parser.add_argument("--model", default=constants.LLM_MODEL_LARGE)
+    arg_parser.add_argument("--route", action="store_true", help="Send routine decisions to constants.LLM_MODEL_FAST")
+    arg_parser.add_argument("--advice", default="")
+    arg_parser.add_argument("--seed", type=int, default=None)
+    arg_parser.add_argument("--gate", action="store_true", help="Skip decisions when a queen's situation is unchanged")
+    arg_parser.add_argument("--engine", choices=["object", "vector"], default="object")
+    arg_parser.add_argument("--max-hives", type=int, default=constants.MAX_HIVES)
+    arg_parser.add_argument("--map-width", type=int, default=constants.MAP_WIDTH)
+    arg_parser.add_argument("--map-height", type=int, default=constants.MAP_HEIGHT)
+    arg_parser.add_argument("--record", default=None, metavar="DIR", help="Write a replay file per match into DIR")
+    args = arg_parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    report = run_batch(build_source_factory(args), args.matches, args.max_turns,
+                       report_every=max(1, args.matches // 10), engine_factory=build_engine_factory(args),
+                       record_dir=args.record)
+    print("=" * 50)
+    print(f"Matches: {report['matches']} | Turns: {report['total_turns']} | Time: {report['elapsed']:.2f}s")
+    print(f"Throughput: {report['turns_per_second']:.0f} turns/second")
+    print(f"BLUE wins: {report['player_wins']} | RED wins: {report['enemy_wins']} | Unfinished: {report['unfinished']}")
+    print(f"Decisions: {report['decisions']} | Skipped by gate: {report['skipped']}")
+    print("=" * 50)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# journal.py
+# Token-budgeted view of the match journal for prompts. The newest entries are
+# kept verbatim; older ones are folded into rolling summaries written by a
+# background summarizer, so the prompt stays roughly the same size no matter
+# how long the match runs. journal.txt on disk still keeps every entry.
+import threading
+import constants
+
+JOURNAL_HEADER = "Journal initialized. I must awaken and learn quickly to survive.\n"
+
+SUMMARY_PROMPT = """You are the archivist of a Hive Mind playing a strategy game.
+Compress the journal excerpt below into at most 3 short sentences. Keep turn ranges, objectives chosen, combat outcomes and lessons learned. Output ONLY the summary.
+
+{text}"""
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting llama-style tokenizers
+    return len(text) // 4 + 1
+
+def compact_entry(entry, max_chars=120):
+    # Cheap extractive fallback: the timestamp line plus the first sentence of the entry
+    lines = entry.strip().split('\n')
+    body = " ".join(lines[1:]).replace("Entry:", "").strip()
+    first_sentence = body.split('. ')[0]
+    if len(first_sentence) > max_chars:
+        first_sentence = first_sentence[:max_chars].rstrip() + "..."
+    return f"{lines[0]}: {first_sentence}"
+
+
+class JournalContext:
+    def __init__(self, summarizer=None, executor=None,
+                 token_budget=constants.JOURNAL_TOKEN_BUDGET,
+                 recent_entries=constants.JOURNAL_RECENT_ENTRIES,
+                 chunk_size=constants.JOURNAL_SUMMARY_CHUNK,
+                 max_summaries=constants.JOURNAL_MAX_SUMMARIES):
+        self.summarizer = summarizer # callable(prompt) -> text; None = extractive compaction only
+        self.executor = executor
+        self.token_budget = token_budget
+        self.recent_entries = recent_entries
+        self.chunk_size = chunk_size
+        self.max_summaries = max_summaries
+
+        self.entries = []
+        self.summaries = []
+        self._summarized_upto = 0 # entries[:_summarized_upto] are covered by self.summaries
+        self._job_running = False
+        self._lock = threading.Lock()
+        self._rendered = None
+
+    def add(self, entry):
+        with self._lock:
+            self.entries.append(entry)
+            self._rendered = None
+        self._schedule()
+
+    def _schedule(self):
+        with self._lock:
+            if self._job_running: return
+            if len(self.summaries) > self.max_summaries:
+                # Roll the oldest half of the summaries into one
+                merge = len(self.summaries) // 2
+                job = ("summaries", merge, "\n".join(self.summaries[:merge]))
+            elif len(self.entries) - self.recent_entries - self._summarized_upto >= self.chunk_size:
+                end = self._summarized_upto + self.chunk_size
+                job = ("entries", end, "".join(self.entries[self._summarized_upto:end]))
+            else:
+                return
+            self._job_running = True
+
+        if self.executor and self.summarizer:
+            self.executor.submit(self._run_job, job)
+        else:
+            self._run_job(job)
+
+    def _run_job(self, job):
+        kind, upto, text = job
+        summary = None
+        if self.summarizer:
+            try:
+                summary = self.summarizer(SUMMARY_PROMPT.format(text=text)).strip()
+            except Exception as e:
+                print(f"Journal Summarizer Error: {str(e)}")
+        if not summary:
+            if kind == "entries":
+                summary = "\n".join(compact_entry(e) for e in self.entries[upto - self.chunk_size:upto])
+            else:
+                summary = text
+
+        with self._lock:
+            if kind == "entries":
+                self.summaries.append(summary)
+                self._summarized_upto = upto
+            else:
+                self.summaries[:upto] = [summary]
+            self._job_running = False
+            self._rendered = None
+        self._schedule()
+
+    # --- NEW: Plain-data state for checkpoint.py ---
+    def get_state(self):
+        with self._lock:
+            return {"entries": list(self.entries), "summaries": list(self.summaries), "summarized_upto": self._summarized_upto}
+
+    def set_state(self, state):
+        with self._lock:
+            self.entries = list(state["entries"])
+            self.summaries = list(state["summaries"])
+            self._summarized_upto = state["summarized_upto"]
+            self._rendered = None
+        self._schedule()
+
+    def render(self):
+        with self._lock:
+            if self._rendered is None:
+                self._rendered = self._build()
+            return self._rendered
+
+    def _build(self):
+        recent_start = max(self._summarized_upto, len(self.entries) - self.recent_entries)
+        recent = self.entries[recent_start:]
+        # Entries that aged out of the verbatim window but have no summary yet
+        backlog = [compact_entry(e) for e in self.entries[self._summarized_upto:recent_start]]
+        summaries = list(self.summaries)
+
+        def size():
+            return estimate_tokens("".join(summaries) + "".join(backlog) + "".join(recent))
+
+        # Over budget: drop the oldest material first, but always keep the latest entry
+        while size() > self.token_budget and (summaries or backlog or len(recent) > 1):
+            if summaries:
+                summaries.pop(0)
+            elif backlog:
+                backlog.pop(0)
+            else:
+                recent.pop(0)
+
+        parts = [JOURNAL_HEADER]
+        if summaries:
+            parts.append("EARLIER IN THIS MATCH (summarized):\n" + "\n".join(summaries) + "\n")
+        if backlog:
+            parts.append("\n".join(backlog) + "\n")
+        if recent:
+            parts.append("\n" + "".join(recent))
+        return "".join(parts)
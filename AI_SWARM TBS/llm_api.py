@@ -1,25 +1,140 @@
 # llm_api.py
+import itertools
+import queue
 import threading
+import time
+from concurrent.futures import Future
+import json
 import requests
+from requests.adapters import HTTPAdapter
 import constants
 import os
+from parser import StreamingCommandParser, parse_llm_command, parse_llm_batch_command, COMMAND_SCHEMA, BATCH_SCHEMA
+from journal import JournalContext, JOURNAL_HEADER
+import prompt_builder
+from prompt_builder import PromptBuilder
+from metrics import LLMMetrics, ParseMetrics
+from decision_cache import DecisionCache
+from file_writer import AsyncFileWriter
+from events import EVENT_OBJECTIVE, EVENT_COMBAT, EVENT_SPAWN, EVENT_DESTROYED
 
 MEMORY_FILE = "memory.txt"
 JOURNAL_FILE = "journal.txt"
+JOURNAL_JSONL_FILE = "journal.jsonl"
+
+class LLMResult:
+    # One finished request, delivered through OllamaConnector.poll_results()
+    def __init__(self, request_id, kind, queen_ids, text=None, error=None, elapsed=0.0, partial=False, parsed=None, context=None,
+                 cached=False, cache_keys=None, model=None, attempt=0):
+        self.request_id = request_id
+        self.kind = kind # "single" or "batch"
+        self.queen_ids = queen_ids
+        self.text = text
+        self.error = error
+        self.elapsed = elapsed
+        # Streaming: a partial result carries the early-parsed ACTION; the final one follows later
+        self.partial = partial
+        self.parsed = parsed
+        self.context = context # Ollama's returned context, for follow-up requests
+        self.cached = cached # Served from the decision cache; parsed is already filled in
+        self.cache_keys = cache_keys or {} # queen_id -> decision cache key
+        self.model = model
+        self.attempt = attempt # 0 = first attempt, n = n-th correction re-prompt
+
+class WorkerPool:
+    """A minimal ThreadPoolExecutor with daemon workers. The standard pool's
+    threads are joined at interpreter exit, so one request stuck in a long read
+    would keep the process alive for the whole LLM_READ_TIMEOUT."""
+    def __init__(self, max_workers, name):
+        self.max_workers = max_workers
+        self.name = name
+        self._queue = queue.Queue()
+        self._threads = []
+        self._idle = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, fn, *args):
+        future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} pool is closed")
+            self._queue.put((future, fn, args))
+            if self._idle:
+                self._idle -= 1 # An idle worker will pick it up
+            elif len(self._threads) < self.max_workers:
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{len(self._threads)}", daemon=True)
+                self._threads.append(thread)
+                thread.start()
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None: return
+            future, fn, args = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+            with self._lock:
+                self._idle += 1
+
+    def shutdown(self, timeout=0.0):
+        """Cancels queued work and waits up to `timeout` seconds for running work.
+        Workers still busy after that are abandoned; being daemons, they don't hold up exit."""
+        with self._lock:
+            self._closed = True
+            threads = list(self._threads)
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None: item[0].cancel()
+        for _ in threads:
+            self._queue.put(None)
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
 
 class OllamaConnector:
-    def __init__(self, model_name="llama3"): 
+    def __init__(self, model_name="llama3", max_in_flight=constants.LLM_MAX_IN_FLIGHT,
+                 timeout=(constants.LLM_CONNECT_TIMEOUT, constants.LLM_READ_TIMEOUT),
+                 stream=constants.LLM_STREAM, max_remark_tokens=constants.LLM_MAX_REMARK_TOKENS,
+                 structured=constants.LLM_STRUCTURED_OUTPUT):
         self.model_name = model_name
         self.url = "http://localhost:11434/api/generate"
-        
-        self.is_generating = False
-        self.response_data = None
-        self.error_message = None
+        self.timeout = timeout
+        self.stream = stream
+        self.max_remark_tokens = max_remark_tokens # None = let the model finish its diary
+        self.structured = structured # Decision requests ask for schema-constrained JSON
+
+        # --- NEW: Persistent HTTP session + bounded worker pool ---
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight + constants.LLM_HOUSEKEEPING_WORKERS)
+        self.session.mount("http://", adapter)
+        self.executor = WorkerPool(max_in_flight, "ollama")
+        # Summaries and the post-mortem never take a slot a decision is waiting for
+        self.housekeeping = WorkerPool(constants.LLM_HOUSEKEEPING_WORKERS, "ollama-housekeeping")
+        self.completed = queue.Queue()
+        self._request_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._in_flight = {} # request_id -> Future
+        self._cancelled = set()
+        self.metrics = LLMMetrics()
+        self.retry_metrics = LLMMetrics("LLM corrections") # Kept apart so retries don't skew first-attempt stats
+        self.parse_metrics = ParseMetrics()
+        self.writer = AsyncFileWriter() # Journal/memory/cache writes never block the game thread
+        self.decision_cache = DecisionCache(writer=self.writer)
         
         self.is_analyzing = False
         self.post_mortem_done = False
         self.ancestral_memory = self._load_memory()
         self.journal = self._load_journal()
+        self._turn_journal = None # Journal as rendered at the start of the current turn
 
     def _load_memory(self):
         if os.path.exists(MEMORY_FILE):
@@ -27,57 +142,83 @@ class OllamaConnector:
                 return f.read().strip()
         else:
             default_memory = "- No prior memories. Focus on gathering food early to build a defense."
-            with open(MEMORY_FILE, "w") as f:
-                f.write(default_memory)
+            self.writer.replace(MEMORY_FILE, default_memory)
             return default_memory
         
     def _load_journal(self):
         # --- FEATURE 1: Clear the journal on startup ---
-        default_journal = "Journal initialized. I must awaken and learn quickly to survive.\n"
-        with open(JOURNAL_FILE, "w") as f: # 'w' ensures it wipes old data
-            f.write(default_journal)
-        return default_journal
+        self.writer.replace(JOURNAL_FILE, JOURNAL_HEADER) # Replacing the file wipes old data
+        if constants.JOURNAL_JSONL:
+            self.writer.replace(JOURNAL_JSONL_FILE, "")
+        # The prompt only sees a token-budgeted view; older entries get summarized in the background
+        return JournalContext(summarizer=self._post, executor=self.housekeeping)
 
     def _save_memory(self, new_memory):
-        with open(MEMORY_FILE, "w") as f:
-            f.write(new_memory)
+        self.writer.replace(MEMORY_FILE, new_memory) # temp file + rename, never half written
         self.ancestral_memory = new_memory
     
     def add_journal_entry(self, turn, hive_id, queen_id, remarks):
         timestamp = f"Turn {turn} | Hive {hive_id} | Queen {queen_id}"
         log_entry = f"{timestamp}\nEntry: {remarks}\n\n"
         
-        with open(JOURNAL_FILE, "a") as f:
-            f.write(log_entry)
+        self.writer.append(JOURNAL_FILE, log_entry)
+        if constants.JOURNAL_JSONL:
+            record = {"turn": turn, "hive": hive_id, "queen": queen_id, "remarks": remarks}
+            self.writer.append(JOURNAL_JSONL_FILE, json.dumps(record, separators=(",", ":")) + "\n")
             
-        self.journal += log_entry
+        self.journal.add(log_entry)
 
-    def generate_prompt(self, queen, engine, user_instructions=""):
-        enemy_hives = sum(1 for h in engine.map.hives if h.faction == constants.FACTION_ENEMY)
-        enemy_warriors = sum(h.warriors for h in engine.map.hives if h.faction == constants.FACTION_ENEMY)
+    # --- NEW: Match state saved in checkpoints (see checkpoint.py) ---
+    def get_state(self):
+        return {"ancestral_memory": self.ancestral_memory, "post_mortem_done": self.post_mortem_done, "journal": self.journal.get_state()}
 
-        recent_logs = queen.hive.diaries[-5:]
-        if recent_logs:
-            short_term_memory = "\n\n".join(recent_logs)
-        else:
-            short_term_memory = "No previous actions. The Hive has just awakened."
+    def set_state(self, state):
+        self.ancestral_memory = state["ancestral_memory"]
+        self.post_mortem_done = state["post_mortem_done"]
+        self.journal.set_state(state["journal"])
+        # journal.txt was wiped on startup; put the restored entries back
+        self.writer.replace(JOURNAL_FILE, JOURNAL_HEADER + "".join(self.journal.entries))
+        self._turn_journal = None
+
+    def begin_turn(self):
+        # Every prompt this turn sees the same journal, whenever it is issued (see scheduler.py)
+        self._turn_journal = self.journal.render()
+
+    # --- NEW: Segments ordered static -> volatile so the server's prefix cache keeps hitting ---
+    def _base_prompt(self, engine, user_instructions, output_format):
+        enemy_stats = engine.map.faction_stats(constants.FACTION_ENEMY)
+        # What changed hands last turn, straight from the event log's turn index
+        last_turn = engine.events.between(engine.turn_number - 1, engine.turn_number - 1, kinds=(EVENT_SPAWN, EVENT_DESTROYED))
+        lost = sum(1 for e in last_turn if e.kind == EVENT_DESTROYED and e.faction == constants.FACTION_PLAYER)
+        razed = sum(1 for e in last_turn if e.kind == EVENT_DESTROYED and e.faction != constants.FACTION_PLAYER)
+        enemy_founded = sum(1 for e in last_turn if e.kind == EVENT_SPAWN and e.faction != constants.FACTION_PLAYER)
+        builder = PromptBuilder()
+        builder.add(prompt_builder.STATIC, prompt_builder.RULES)
+        builder.add(prompt_builder.STATIC, output_format)
+        builder.add(prompt_builder.MATCH, f"ANCESTRAL MEMORY:\n{self.ancestral_memory}\n")
 
         # --- FEATURE 2: Inject Advisor Instructions ---
-        advisor_block = ""
         if user_instructions:
-            advisor_block = f"\nTHE ADVISOR SPEAKS (Follow this guidance):\n{user_instructions}\n"
+            builder.add(prompt_builder.ADVISOR, f"THE ADVISOR SPEAKS (Follow this guidance):\n{user_instructions}\n")
 
-        prompt = f"""WARNING: Your response is being read by a Pygame parser. Follow these guidelines strictly.
-
-You are a Hive Mind. You set Objectives for your Queens, and they will run autonomously to execute your will.
-{advisor_block}
-ANCESTRAL MEMORY:
-{self.ancestral_memory}
+        builder.add(prompt_builder.JOURNAL, f"LONG-TERM JOURNAL (Your history across this match):\n{self._turn_journal if self._turn_journal is not None else self.journal.render()}")
+        builder.add(prompt_builder.TURN, f"""THREAT REPORT:
+- Known Enemy Hives: {enemy_stats.hives}
+- Total Enemy Warriors Spotted: {enemy_stats.warriors}
+- Last Turn: {lost} of our Hives lost | {razed} enemy Hives destroyed | {enemy_founded} new enemy Hives
+""")
+        return builder
 
-LONG-TERM JOURNAL (Your history across this match):
-{self.journal}
+    def generate_prompt(self, queen, engine, user_instructions=""):
+        recent_logs = queen.hive.diaries[-5:]
+        if recent_logs:
+            short_term_memory = "\n\n".join(recent_logs)
+        else:
+            short_term_memory = "No previous actions. The Hive has just awakened."
 
-RECENT THOUGHTS (Last 5 turns for this specific Hive):
+        output_format = prompt_builder.JSON_SINGLE_FORMAT if self.structured else prompt_builder.SINGLE_FORMAT
+        builder = self._base_prompt(engine, user_instructions, output_format)
+        builder.add(prompt_builder.REQUEST, f"""RECENT THOUGHTS (Last 5 turns for this specific Hive):
 {short_term_memory}
 
 CURRENT GAME STATE:
@@ -86,55 +227,263 @@ Hive {queen.hive.hive_id} Stats:
 - Food: {queen.hive.food} | Workers: {queen.hive.workers} | Warriors: {queen.hive.warriors}
 - Current Objective: {queen.objective}
 
-THREAT REPORT:
-- Known Enemy Hives: {enemy_hives}
-- Total Enemy Warriors Spotted: {enemy_warriors}
-
-VALID ACTIONS (You MUST set exactly ONE objective. DO NOT output micro-commands like 'Produce Workers'):
-* {constants.ACTION_SET_OBJ_BALANCED} (Queen will build an equal mix of workers and warriors, attacking when her army is large.)
-* {constants.ACTION_SET_OBJ_AGGRESSIVE} (Queen will halt economy, aggressively pump out warriors, and send frequent attacks.)
-* {constants.ACTION_SET_OBJ_ECONOMY} (Queen will ignore military, build massive worker populations, and rapidly spawn new Hives.)
-
-REQUIRED OUTPUT FORMAT:
-TARGET UNIT: QUEEN
-ACTION: [Insert exactly one valid action]
-REMARKS: [Your diary. State your grand strategy here.]
-"""
-        return prompt
-
-    def _make_request(self, prompt):
-        self.is_generating = True
-        self.response_data = None
-        self.error_message = None
-        payload = {"model": self.model_name, "prompt": prompt, "stream": False}
-        
-        try:
-            response = requests.post(self.url, json=payload)
+Respond now using the REQUIRED OUTPUT FORMAT.
+""")
+        return builder.build()
+
+    # --- NEW: One prompt covering every queen awaiting orders ---
+    def generate_batch_prompt(self, queens, engine, user_instructions=""):
+        queen_blocks = []
+        for queen in queens:
+            recent_logs = queen.hive.diaries[-5:]
+            short_term_memory = "\n".join(recent_logs) if recent_logs else "No previous actions. The Hive has just awakened."
+            queen_blocks.append(f"""QUEEN {queen.queen_id} (Hive {queen.hive.hive_id}):
+- Food: {queen.hive.food} | Workers: {queen.hive.workers} | Warriors: {queen.hive.warriors}
+- Current Objective: {queen.objective}
+- Recent Thoughts:
+{short_term_memory}""")
+        queen_section = "\n\n".join(queen_blocks)
+        queen_ids = ", ".join(str(q.queen_id) for q in queens)
+
+        output_format = prompt_builder.JSON_BATCH_FORMAT if self.structured else prompt_builder.BATCH_FORMAT
+        builder = self._base_prompt(engine, user_instructions, output_format)
+        builder.add(prompt_builder.REQUEST, f"""CURRENT GAME STATE:
+Awaiting orders for {len(queens)} Queens: {queen_ids}.
+
+{queen_section}
+
+Respond now with one REQUIRED OUTPUT FORMAT block per Queen.
+""")
+        return builder.build()
+
+    def _payload(self, prompt, stream, context=None, model=None, kind=None):
+        # keep_alive holds the model (and its prompt cache) in memory between calls
+        payload = {"model": model or self.model_name, "prompt": prompt, "stream": stream, "keep_alive": constants.LLM_KEEP_ALIVE}
+        if context:
+            payload["context"] = context
+        # Decision requests (kind set) are constrained to the command schema; housekeeping stays free text
+        if self.structured and kind:
+            payload["format"] = BATCH_SCHEMA if kind == "batch" else COMMAND_SCHEMA
+        return payload
+
+    def _post(self, prompt):
+        # Housekeeping requests (summaries, post-mortem) stay out of the decision metrics
+        return self._post_with_context(prompt)[0]
+
+    def _post_with_context(self, prompt, context=None, metrics=None, model=None, kind=None):
+        response = self.session.post(self.url, json=self._payload(prompt, False, context, model, kind), timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if metrics:
+            metrics.record(prompt, data)
+        return data.get("response", ""), data.get("context")
+
+    # --- NEW: Streaming mode. Reads Ollama's NDJSON chunks as they are generated ---
+    def _post_streaming(self, request_id, prompt, kind, queen_ids, start, model=None, context=None, attempt=0):
+        stream_parser = StreamingCommandParser()
+        metrics = self.retry_metrics if attempt else self.metrics
+
+        done = False
+        with self.session.post(self.url, json=self._payload(prompt, True, context, model, kind), timeout=self.timeout, stream=True) as response:
+            context = None
             response.raise_for_status()
-            data = response.json()
-            self.response_data = data.get("response", "")
+            for line in response.iter_lines():
+                if not line: continue
+                chunk = json.loads(line)
+                early = stream_parser.feed(chunk.get("response", ""))
+
+                if chunk.get("done"):
+                    # The final chunk carries the timing stats and context
+                    metrics.record(prompt, chunk)
+                    context = chunk.get("context")
+                    done = True
+                    break
+                if request_id in self._cancelled:
+                    break
+                if kind != "single":
+                    continue # Batched replies hold several ACTION blocks; wait for all of them
+                if early:
+                    self.completed.put(LLMResult(request_id, kind, queen_ids, elapsed=time.perf_counter() - start, partial=True, parsed=early, model=model, attempt=attempt))
+                # Closing the response early makes Ollama stop generating
+                if self.max_remark_tokens is not None and stream_parser.remark_tokens >= self.max_remark_tokens:
+                    break
+        if not done:
+            # Closed before the final chunk: still count the request with our own timing.
+            # There is no context to continue, so a correction re-prompt starts fresh
+            metrics.record_closed_early(prompt, time.perf_counter() - start)
+        return stream_parser.text, context
+
+    def _make_request(self, request_id, prompt, kind, queen_ids, cache_keys=None, model=None, context=None, attempt=0):
+        model = model or self.model_name
+        if request_id in self._cancelled: return
+        start = time.perf_counter()
+        text, error = None, None
+        try:
+            if self.stream:
+                text, context = self._post_streaming(request_id, prompt, kind, queen_ids, start, model, context, attempt)
+            else:
+                metrics = self.retry_metrics if attempt else self.metrics
+                text, context = self._post_with_context(prompt, context, metrics, model, kind)
         except Exception as e:
-            self.error_message = f"Ollama Connection Error: {str(e)}"
+            error = f"Ollama Connection Error: {str(e)}"
         finally:
-            self.is_generating = False
+            with self._lock:
+                self._in_flight.pop(request_id, None)
+                cancelled = request_id in self._cancelled
+                self._cancelled.discard(request_id)
+        if not cancelled:
+            self.completed.put(LLMResult(request_id, kind, queen_ids, text, error, time.perf_counter() - start, context=context,
+                                         cache_keys=cache_keys, model=model, attempt=attempt))
+
+    def _submit(self, prompt, kind, queen_ids, cache_keys=None, model=None, context=None, attempt=0):
+        request_id = next(self._request_ids)
+        with self._lock:
+            self._in_flight[request_id] = self.executor.submit(self._make_request, request_id, prompt, kind, queen_ids, cache_keys, model, context, attempt)
+        return request_id
+
+    @property
+    def is_generating(self):
+        return bool(self._in_flight)
+
+    @property
+    def in_flight_count(self):
+        return len(self._in_flight)
+
+    def poll_results(self):
+        # Drains every result that finished since the last call (never blocks)
+        results = []
+        while True:
+            try:
+                results.append(self.completed.get_nowait())
+            except queue.Empty:
+                return results
+
+    def cancel(self, request_id):
+        # Queued requests never start. Running ones finish, but their result is dropped.
+        with self._lock:
+            future = self._in_flight.get(request_id)
+            if future is None: return
+            if future.cancel():
+                self._in_flight.pop(request_id, None)
+            else:
+                self._cancelled.add(request_id)
+
+    def cancel_all(self):
+        for request_id in list(self._in_flight):
+            self.cancel(request_id)
+
+    def close(self):
+        # Decisions are dropped at once; a summary or post-mortem gets a short grace period
+        self.cancel_all()
+        self.executor.shutdown()
+        self.housekeeping.shutdown(constants.LLM_SHUTDOWN_GRACE)
+        self.session.close()
+        self.decision_cache.save()
+        self.writer.close()
+
+    # --- NEW: Decision cache. Hits are answered without touching the network ---
+    def _cache_key(self, queen, engine, user_instructions, model=None):
+        return DecisionCache.make_key(model or self.model_name, queen, engine, user_instructions, self.ancestral_memory)
+
+    def _serve_cached(self, queen, cache_key, model=None):
+        parsed = self.decision_cache.get(cache_key)
+        if parsed is None: return None
+        request_id = next(self._request_ids)
+        self.completed.put(LLMResult(request_id, "single", [queen.queen_id], parsed=parsed, cached=True, model=model or self.model_name))
+        return request_id
+
+    # --- NEW: Parses a finished reply and keeps parse_metrics up to date ---
+    def parse_result(self, result):
+        """Returns the parsed dict for a single result, {queen_id: parsed} for a batch."""
+        if result.kind == "batch":
+            parsed = parse_llm_batch_command(result.text, result.queen_ids)
+            for parsed_data in parsed.values():
+                self.parse_metrics.record(parsed_data)
+        else:
+            parsed = parse_llm_command(result.text)
+            self.parse_metrics.record(parsed)
+        return parsed
+
+    def remember_decision(self, result, queen_id, parsed_data):
+        self.decision_cache.put(result.cache_keys.get(queen_id), parsed_data)
+
+    # model overrides self.model_name for this one request (see model_router.py)
+    def request_action(self, queen, engine, user_instructions="", use_cache=True, model=None):
+        cache_key = self._cache_key(queen, engine, user_instructions, model)
+        if use_cache:
+            request_id = self._serve_cached(queen, cache_key, model)
+            if request_id is not None: return request_id
 
-    def request_action(self, queen, engine, user_instructions=""):
-        if self.is_generating: return 
         # Pass the instructions down to the generator
         prompt = self.generate_prompt(queen, engine, user_instructions)
-        thread = threading.Thread(target=self._make_request, args=(prompt,))
-        thread.daemon = True 
-        thread.start()
+        return self._submit(prompt, "single", [queen.queen_id], {queen.queen_id: cache_key}, model)
+
+    def request_batch_action(self, queens, engine, user_instructions="", use_cache=True, model=None):
+        # Cached queens come back as individual results; only the rest go into the batch.
+        # Returns None when every queen was a cache hit.
+        cache_keys = {}
+        uncached = []
+        for queen in queens:
+            cache_key = self._cache_key(queen, engine, user_instructions, model)
+            if use_cache and self._serve_cached(queen, cache_key, model) is not None: continue
+            cache_keys[queen.queen_id] = cache_key
+            uncached.append(queen)
+
+        if not uncached: return None
+        if len(uncached) == 1:
+            prompt = self.generate_prompt(uncached[0], engine, user_instructions)
+            return self._submit(prompt, "single", [uncached[0].queen_id], cache_keys, model)
+        prompt = self.generate_batch_prompt(uncached, engine, user_instructions)
+        return self._submit(prompt, "batch", [q.queen_id for q in uncached], cache_keys, model)
+
+    # --- NEW: Blocking variant for the headless runner (no pygame loop to poll from) ---
+    def request_action_blocking(self, queen, engine, user_instructions="", use_cache=True, model=None):
+        model = model or self.model_name
+        cache_keys = {queen.queen_id: self._cache_key(queen, engine, user_instructions, model)}
+        parsed = self.decision_cache.get(cache_keys[queen.queen_id]) if use_cache else None
+        if parsed is not None:
+            return LLMResult(None, "single", [queen.queen_id], parsed=parsed, cached=True, model=model)
+
+        prompt = self.generate_prompt(queen, engine, user_instructions)
+        start = time.perf_counter()
+        try:
+            text, context = self._post_with_context(prompt, metrics=self.metrics, model=model, kind="single")
+            return LLMResult(None, "single", [queen.queen_id], text=text, elapsed=time.perf_counter() - start, context=context, cache_keys=cache_keys, model=model)
+        except Exception as e:
+            return LLMResult(None, "single", [queen.queen_id], error=f"Ollama Connection Error: {str(e)}", elapsed=time.perf_counter() - start, model=model)
+
+    # --- NEW: Correction re-prompts. A formatting fix costs tens of tokens instead of a full prompt ---
+    def _correction_prompt(self, result, error_message):
+        if result.kind == "batch":
+            output_format = prompt_builder.JSON_BATCH_FORMAT if self.structured else prompt_builder.BATCH_FORMAT
+        else:
+            output_format = prompt_builder.JSON_SINGLE_FORMAT if self.structured else prompt_builder.SINGLE_FORMAT
+        reply = (result.text or "").strip() or "(empty reply)"
+        return prompt_builder.CORRECTION_PROMPT.format(reply=reply, error=error_message, output_format=output_format)
+
+    def request_correction(self, result, error_message, queen_ids=None):
+        """Re-asks the same model to fix a reply the parser rejected. The previous
+        request's context is continued when Ollama returned one (a context only
+        makes sense to the model that produced it, so the model never changes)."""
+        prompt = self._correction_prompt(result, error_message)
+        return self._submit(prompt, result.kind, queen_ids or result.queen_ids, result.cache_keys, result.model,
+                            context=result.context, attempt=result.attempt + 1)
+
+    def request_correction_blocking(self, result, error_message):
+        prompt = self._correction_prompt(result, error_message)
+        start = time.perf_counter()
+        try:
+            text, context = self._post_with_context(prompt, result.context, self.retry_metrics, result.model, result.kind)
+            return LLMResult(None, result.kind, result.queen_ids, text=text, elapsed=time.perf_counter() - start, context=context,
+                             cache_keys=result.cache_keys, model=result.model, attempt=result.attempt + 1)
+        except Exception as e:
+            return LLMResult(None, result.kind, result.queen_ids, error=f"Ollama Connection Error: {str(e)}", elapsed=time.perf_counter() - start,
+                             model=result.model, attempt=result.attempt + 1)
 
     # ... [post_mortem functions remain exactly the same] ...
     def _make_post_mortem_request(self, prompt):
-        self.is_analyzing = True
-        payload = {"model": self.model_name, "prompt": prompt, "stream": False}
         try:
-            response = requests.post(self.url, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            new_memory = data.get("response", "").strip()
+            new_memory = self._post(prompt).strip()
             self._save_memory(new_memory)
         except Exception as e:
             print(f"Post-Mortem Error: {str(e)}")
@@ -142,6 +491,21 @@ REMARKS: [Your diary. State your grand strategy here.]
             self.is_analyzing = False
             self.post_mortem_done = True
 
+    def _match_chronicle(self, engine):
+        # Whole-match tallies from the event log's kind index, plus the last few decisive moments
+        log = engine.events
+        player, enemy = constants.FACTION_PLAYER, constants.FACTION_ENEMY
+        lines = ["MATCH CHRONICLE:",
+                 f"- Hives founded: {player} {log.count(EVENT_SPAWN, player)} | {enemy} {log.count(EVENT_SPAWN, enemy)}",
+                 f"- Hives lost: {player} {log.count(EVENT_DESTROYED, player)} | {enemy} {log.count(EVENT_DESTROYED, enemy)}",
+                 f"- Attacks launched: {player} {log.count(EVENT_COMBAT, player)} | {enemy} {log.count(EVENT_COMBAT, enemy)}",
+                 f"- Objective orders given: {log.count(EVENT_OBJECTIVE, player)}"]
+        moments = log.latest(5, kinds=(EVENT_DESTROYED,))
+        if moments:
+            lines.append("KEY MOMENTS:")
+            lines.extend(f"- Turn {e.turn}: {e.text.replace('--> ', '')}" for e in moments)
+        return "\n".join(lines)
+
     def run_post_mortem(self, engine, is_victory):
         if self.is_analyzing or self.post_mortem_done: return
         turn_count = engine.turn_number
@@ -150,11 +514,12 @@ REMARKS: [Your diary. State your grand strategy here.]
 OUTCOME: {outcome}
 Turns Lasted: {turn_count}
 
+{self._match_chronicle(engine)}
+
 PREVIOUS ANCESTRAL MEMORY:
 {self.ancestral_memory}
 
 Write a new, updated Ancestral Memory in 3 bullet points or less detailing what strategy worked and what you should do differently next time to win faster or avoid dying. 
 Keep it concise. Do not include any introductory or concluding text, ONLY output the bullet points."""
-        thread = threading.Thread(target=self._make_post_mortem_request, args=(pm_prompt,))
-        thread.daemon = True 
-        thread.start()
\ No newline at end of file
+        self.is_analyzing = True
+        self.housekeeping.submit(self._make_post_mortem_request, pm_prompt)
\ No newline at end of file
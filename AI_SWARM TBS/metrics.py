@@ -0,0 +1,127 @@
+# metrics.py
+# Lightweight counters for the LLM pipeline. Everything here is best-effort
+# bookkeeping read by humans (printed at exit), never used for game logic.
+import threading
+from journal import estimate_tokens
+from prompt_builder import shared_prefix_length
+
+NS_PER_SECOND = 1_000_000_000
+
+class LLMMetrics:
+    """Per-request prompt-eval vs generation timings reported by Ollama.
+    Ollama only evaluates prompt tokens that missed its prefix cache, so
+    prompt_eval_count / estimated prompt tokens shows the cache hit rate."""
+    def __init__(self, label="LLM"):
+        self.label = label
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens_estimated = 0
+        self.prompt_tokens_evaluated = 0
+        self.prompt_eval_seconds = 0.0
+        self.generated_tokens = 0
+        self.generation_seconds = 0.0
+        self.total_seconds = 0.0
+        self.shared_prefix_chars = 0
+        self.prompt_chars = 0
+        self.closed_early = 0 # Streams cut before Ollama's final chunk: client-side latency only
+        self.last_request = None
+        self._last_prompt = ""
+
+    def record(self, prompt, data):
+        stats = {
+            "prompt_tokens_estimated": estimate_tokens(prompt),
+            "prompt_tokens_evaluated": data.get("prompt_eval_count", 0),
+            "prompt_eval_seconds": data.get("prompt_eval_duration", 0) / NS_PER_SECOND,
+            "generated_tokens": data.get("eval_count", 0),
+            "generation_seconds": data.get("eval_duration", 0) / NS_PER_SECOND,
+            "total_seconds": data.get("total_duration", 0) / NS_PER_SECOND,
+        }
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens_estimated += stats["prompt_tokens_estimated"]
+            self.prompt_tokens_evaluated += stats["prompt_tokens_evaluated"]
+            self.prompt_eval_seconds += stats["prompt_eval_seconds"]
+            self.generated_tokens += stats["generated_tokens"]
+            self.generation_seconds += stats["generation_seconds"]
+            self.total_seconds += stats["total_seconds"]
+            self.shared_prefix_chars += shared_prefix_length(self._last_prompt, prompt)
+            self.prompt_chars += len(prompt)
+            self._last_prompt = prompt
+            self.last_request = stats
+        return stats
+
+    def record_closed_early(self, prompt, seconds):
+        # Ollama only reports its counters in the final chunk, so they stay None here and
+        # the request is left out of the token totals (and the cache hit estimate)
+        stats = {
+            "prompt_tokens_estimated": estimate_tokens(prompt),
+            "prompt_tokens_evaluated": None,
+            "prompt_eval_seconds": None,
+            "generated_tokens": None,
+            "generation_seconds": None,
+            "total_seconds": seconds,
+        }
+        with self._lock:
+            self.requests += 1
+            self.closed_early += 1
+            self.total_seconds += seconds
+            self.shared_prefix_chars += shared_prefix_length(self._last_prompt, prompt)
+            self.prompt_chars += len(prompt)
+            self._last_prompt = prompt
+            self.last_request = stats
+        return stats
+
+    @property
+    def cache_hit_rate(self):
+        if not self.prompt_tokens_estimated: return 0.0
+        return max(0.0, 1.0 - self.prompt_tokens_evaluated / self.prompt_tokens_estimated)
+
+    @property
+    def prefix_reuse_rate(self):
+        # How much of each prompt matched the previous one, from our side of the wire
+        return self.shared_prefix_chars / self.prompt_chars if self.prompt_chars else 0.0
+
+    @property
+    def average_latency(self):
+        return self.total_seconds / self.requests if self.requests else 0.0
+
+    def summary(self):
+        if not self.requests:
+            return f"{self.label}: no requests made."
+        closed_early = f" ({self.closed_early} closed early, no server timings)" if self.closed_early else ""
+        return (f"{self.label}: {self.requests} requests{closed_early} | avg latency {self.average_latency:.2f}s | "
+                f"prompt eval {self.prompt_tokens_evaluated} tok in {self.prompt_eval_seconds:.1f}s | "
+                f"generation {self.generated_tokens} tok in {self.generation_seconds:.1f}s | "
+                f"prefix reuse {self.prefix_reuse_rate:.0%} | est. cache hit {self.cache_hit_rate:.0%}")
+
+
+class ParseMetrics:
+    """Outcomes of parsing final replies. A reply that only parsed thanks to
+    local repair would otherwise have cost a full regeneration."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.replies = 0
+        self.parsed = 0
+        self.repaired = 0
+
+    def record(self, parsed_data):
+        with self._lock:
+            self.replies += 1
+            if parsed_data["status"] == "success":
+                self.parsed += 1
+                if parsed_data.get("repaired"):
+                    self.repaired += 1
+
+    @property
+    def success_rate(self):
+        return self.parsed / self.replies if self.replies else 0.0
+
+    @property
+    def retries_avoided(self):
+        return self.repaired
+
+    def summary(self):
+        if not self.replies:
+            return "Parser: no replies parsed."
+        return (f"Parser: {self.parsed}/{self.replies} replies parsed ({self.success_rate:.0%}) | "
+                f"retries avoided by local repair: {self.retries_avoided}")
@@ -0,0 +1,113 @@
+# model_router.py
+# Picks which Ollama model answers each decision. Routine objective
+# confirmations go to a small, fast model; critical moments escalate to the
+# large one. Per-tier latency and the escalation rate are tracked so the
+# quality/throughput trade-off can be tuned.
+from collections import Counter
+import constants
+
+TIER_FAST = "fast"
+TIER_LARGE = "large"
+
+class TierStats:
+    def __init__(self):
+        self.requests = 0
+        self.total_seconds = 0.0
+
+    @property
+    def average_seconds(self):
+        return self.total_seconds / self.requests if self.requests else 0.0
+
+
+class ModelRouter:
+    def __init__(self, fast_model=constants.LLM_MODEL_FAST, large_model=constants.LLM_MODEL_LARGE,
+                 surge_ratio=constants.ROUTER_SURGE_RATIO, surge_minimum=constants.ROUTER_SURGE_MINIMUM):
+        self.models = {TIER_FAST: fast_model, TIER_LARGE: large_model}
+        self.surge_ratio = surge_ratio
+        self.surge_minimum = surge_minimum
+        self.fast_available = True
+
+        self.diary_seen = {} # queen_id -> diary lines written when she was last routed
+        self.failed_queens = set() # Queens whose last answer didn't parse
+        self.turn_alerts = [] # Faction-wide critical events spotted at the start of this turn
+        self._last_player_hives = None
+        self._last_enemy_warriors = None
+
+        self.tier_stats = {TIER_FAST: TierStats(), TIER_LARGE: TierStats()}
+        self.routed = Counter()
+        self.escalations = Counter() # reason -> count
+
+    def observe_turn(self, engine):
+        # Call once after every start_turn()
+        player_hives = engine.map.hive_count(constants.FACTION_PLAYER)
+        enemy_warriors = engine.map.faction_stats(constants.FACTION_ENEMY).warriors
+        self.turn_alerts = []
+
+        if self._last_player_hives is not None and player_hives < self._last_player_hives:
+            self.turn_alerts.append("hive_lost")
+        if self._last_enemy_warriors is not None:
+            grown = enemy_warriors - self._last_enemy_warriors
+            if grown >= self.surge_minimum and enemy_warriors >= self._last_enemy_warriors * self.surge_ratio:
+                self.turn_alerts.append("enemy_surge")
+
+        self._last_player_hives = player_hives
+        self._last_enemy_warriors = enemy_warriors
+
+    def _reasons(self, queen):
+        reasons = list(self.turn_alerts)
+        entries, lost = queen.hive.diaries.since(self.diary_seen.get(queen.queen_id, 0))
+        if lost or any("COMBAT" in entry for entry in entries):
+            reasons.append("combat")
+        if queen.queen_id in self.failed_queens:
+            reasons.append("parse_failure")
+        return reasons
+
+    def choose(self, queens):
+        """Returns the model for a request covering these queens (one queen, or a batch)."""
+        reasons = []
+        for queen in queens:
+            reasons.extend(self._reasons(queen))
+            self.diary_seen[queen.queen_id] = queen.hive.diaries.written
+
+        if reasons or not self.fast_available:
+            tier = TIER_LARGE
+            for reason in set(reasons):
+                self.escalations[reason] += 1
+        else:
+            tier = TIER_FAST
+        self.routed[tier] += 1
+        return self.models[tier]
+
+    def note_parse_failure(self, queen_id):
+        self.failed_queens.add(queen_id)
+
+    def note_success(self, queen_id):
+        self.failed_queens.discard(queen_id)
+
+    def note_error(self, model):
+        # A missing/broken fast model shouldn't stop auto-play; route everything to the large one
+        if model == self.models[TIER_FAST] and self.fast_available:
+            self.fast_available = False
+            print(f"Model router: fast model '{model}' failed. Using '{self.models[TIER_LARGE]}' for every decision.")
+            return True
+        return False
+
+    def record_latency(self, model, seconds):
+        for tier, name in self.models.items():
+            if name == model:
+                stats = self.tier_stats[tier]
+                stats.requests += 1
+                stats.total_seconds += seconds
+                return
+
+    @property
+    def escalation_rate(self):
+        total = sum(self.routed.values())
+        return self.routed[TIER_LARGE] / total if total else 0.0
+
+    def summary(self):
+        fast, large = self.tier_stats[TIER_FAST], self.tier_stats[TIER_LARGE]
+        reasons = ", ".join(f"{r}: {n}" for r, n in self.escalations.most_common()) or "none"
+        return (f"Model router: fast '{self.models[TIER_FAST]}' {fast.requests} req @ {fast.average_seconds:.1f}s | "
+                f"large '{self.models[TIER_LARGE]}' {large.requests} req @ {large.average_seconds:.1f}s | "
+                f"escalation rate {self.escalation_rate:.0%} ({reasons})")
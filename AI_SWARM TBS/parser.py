@@ -1,53 +1,274 @@
 # parser.py
+import difflib
+import json
+import re
 import constants
 
-def parse_llm_command(text):
-    """Parses the LLM output and validates it against the new Macro Objectives."""
-    lines = text.strip().split('\n')
-    
-    target = None
-    action = None
-    remarks = ""
-    
-    in_remarks = False
-    
-    for line in lines:
-        line = line.strip()
-        
-        if line.startswith("TARGET UNIT:"):
-            target = line.replace("TARGET UNIT:", "").strip()
-        elif line.startswith("ACTION:"):
-            action = line.replace("ACTION:", "").strip()
-        elif line.startswith("REMARKS:"):
-            in_remarks = True
-            remarks = line.replace("REMARKS:", "").strip()
-        elif in_remarks:
-            remarks += " " + line
-
-    # Validation Checks
-    if not target or not action:
-        return {"status": "error", "message": "Formatting Error: Missing TARGET UNIT or ACTION."}
-        
-    if target != constants.TARGET_QUEEN:
-        return {"status": "error", "message": f"Target Error: Invalid target '{target}'."}
-        
-    # Strictly enforce the new macro-objectives
-    valid_action_found = False
+# --- NEW: Structured output. Ollama constrains generation to these JSON schemas ---
+COMMAND_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "target": {"type": "string", "enum": [constants.TARGET_QUEEN]},
+        "action": {"type": "string", "enum": list(constants.VALID_ACTIONS)},
+        "remarks": {"type": "string"},
+    },
+    "required": ["target", "action", "remarks"],
+}
+
+BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "orders": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"queen_id": {"type": "integer"}, **COMMAND_SCHEMA["properties"]},
+                "required": ["queen_id", "target", "action", "remarks"],
+            },
+        },
+    },
+    "required": ["orders"],
+}
+
+# --- NEW: Compiled once; each reply is scanned in a single pass ---
+_JSON_START_RE = re.compile(r"^\s*(?:```(?:json)?\s*)?[\[{]")
+_LINE_FIELD_RE = re.compile(r"^[ \t*#>-]*([A-Za-z][A-Za-z _]{0,15}?)[ \t*]*:[ \t*]*(.*)$", re.MULTILINE)
+_JSON_FIELD_RE = re.compile(r'"([A-Za-z _]{1,20})"\s*:\s*(?:"((?:[^"\\]|\\.)*)"?|(-?\d+))')
+_JSON_REMARKS_RE = re.compile(r'"(?:remarks?|diary)"\s*:', re.IGNORECASE)
+_OBJECTIVE_RE = re.compile(r"set\s+objective\s*:\s*([A-Za-z]+)", re.IGNORECASE)
+
+# Tolerated spellings of each field name, compared lowercase with non-letters stripped
+_KEY_ALIASES = {
+    "target": "target", "targetunit": "target", "unit": "target",
+    "action": "action", "objective": "action", "order": "action",
+    "remarks": "remarks", "remark": "remarks", "diary": "remarks",
+    "queenid": "queen_id", "queen": "queen_id", "id": "queen_id",
+}
+_QUEEN_SPELLINGS = {"queen", "queens", "queenunit", "thequeen"}
+
+# "balanced" -> "Set Objective: Balanced", for fuzzy repair of objective names
+_OBJECTIVE_ACTIONS = {action.split(":")[-1].strip().lower(): action for action in constants.VALID_ACTIONS}
+_REPAIR_CUTOFF = 0.85 # difflib ratio an objective name must reach to count as a misspelling
+_REPAIR_MARGIN = 0.1 # ...and how far ahead of the next-closest objective it must be
+
+def _normalize_key(key):
+    return _KEY_ALIASES.get(re.sub(r"[^a-z]", "", key.lower()))
+
+def _scan_lines(text):
+    """TARGET UNIT / ACTION / REMARKS lines. The first occurrence of each field
+    wins; REMARKS runs until the next unseen field or the end of the text."""
+    fields = {}
+    remarks_start = remarks_end = None
+    for match in _LINE_FIELD_RE.finditer(text):
+        key = _normalize_key(match.group(1))
+        if key is None or key in fields:
+            continue
+        if remarks_start is not None and remarks_end is None:
+            remarks_end = match.start()
+        fields[key] = match.group(2).strip()
+        if key == "remarks":
+            remarks_start = match.end()
+    if remarks_start is not None:
+        tail = [line.strip() for line in text[remarks_start:remarks_end].split('\n') if line.strip()]
+        fields["remarks"] = " ".join([fields["remarks"]] + tail).strip()
+    return fields
+
+def _unescape(value):
+    try:
+        return json.loads(f'"{value}"')
+    except ValueError:
+        return value.replace('\\"', '"')
+
+def _json_fields(data):
+    fields = {}
+    for key, value in data.items():
+        key = _normalize_key(str(key))
+        if key and key not in fields and value is not None:
+            fields[key] = value if key == "queen_id" else str(value)
+    return fields
+
+def _scan_json_fields(text):
+    """Local repair for JSON the decoder rejects (e.g. a stream cut off mid-remarks):
+    pull "key": "value" pairs out directly, accepting an unterminated last string."""
+    fields = {}
+    for match in _JSON_FIELD_RE.finditer(text):
+        key = _normalize_key(match.group(1))
+        if key is None or key in fields:
+            continue
+        if match.group(3) is not None:
+            fields[key] = int(match.group(3))
+        else:
+            fields[key] = _unescape(match.group(2))
+    return fields
+
+def _load_json(text):
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    end = max(text.rfind("}"), text.rfind("]"))
+    if start < 0 or end < start:
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+
+def _resolve_action(action, text):
+    """Returns (normalized action, repaired) or (None, False)."""
+    lowered = action.lower() if action else ""
     for valid_action in constants.VALID_ACTIONS:
-        if valid_action.lower() in action.lower():
-            action = valid_action # Normalize it exactly to the constant
-            valid_action_found = True
-            break
-            
-    if not valid_action_found:
+        if valid_action.lower() in lowered:
+            return valid_action, False
+
+    # Local repair: only the objective name itself ("Set Objective: Agressive"), taken from
+    # the ACTION line, or from anywhere in the reply when the ACTION line is missing
+    found = _OBJECTIVE_RE.search(lowered if lowered else text)
+    if not found:
+        return None, False
+    return _repair_objective(found.group(1).lower())
+
+def _repair_objective(word):
+    # Misspellings only: a different word ("Progressive", "Defensive") or one that sits
+    # about as close to two objectives is left to the correction re-prompt
+    scored = sorted(((difflib.SequenceMatcher(None, word, name).ratio(), name) for name in _OBJECTIVE_ACTIONS), reverse=True)
+    (best, name), (runner_up, _) = scored[0], scored[1]
+    if best < _REPAIR_CUTOFF or best - runner_up < _REPAIR_MARGIN:
+        return None, False
+    return _OBJECTIVE_ACTIONS[name], True
+
+def _validate(fields, text):
+    target = str(fields.get("target", "")).strip()
+    action, repaired = _resolve_action(str(fields.get("action", "")).strip(), text)
+
+    if not target:
+        if not action:
+            return {"status": "error", "message": "Formatting Error: Missing TARGET UNIT or ACTION."}
+        target, repaired = constants.TARGET_QUEEN, True # The Queen is the only valid target
+    elif target != constants.TARGET_QUEEN:
+        if re.sub(r"[^a-z]", "", target.lower()) not in _QUEEN_SPELLINGS:
+            return {"status": "error", "message": f"Target Error: Invalid target '{target}'."}
+        target, repaired = constants.TARGET_QUEEN, True
+
+    if not action:
+        if not fields.get("action"):
+            return {"status": "error", "message": "Formatting Error: Missing TARGET UNIT or ACTION."}
         return {
-            "status": "error", 
-            "message": f"Action Error: '{action}' is invalid. You MUST use 'Set Objective: Balanced', 'Set Objective: Aggressive', or 'Set Objective: Economy'."
+            "status": "error",
+            "message": f"Action Error: '{fields['action']}' is invalid. You MUST use 'Set Objective: Balanced', 'Set Objective: Aggressive', or 'Set Objective: Economy'."
         }
-        
+
     return {
         "status": "success",
         "target": target,
         "action": action,
-        "remarks": remarks
-    }
\ No newline at end of file
+        "remarks": str(fields.get("remarks", "")).strip(),
+        "repaired": repaired # True when local repair saved a regeneration
+    }
+
+def parse_llm_command(text):
+    """Parses the LLM output (plain lines or structured JSON) and validates it against the Macro Objectives."""
+    if _JSON_START_RE.match(text):
+        data = _load_json(text)
+        fields = _json_fields(data) if isinstance(data, dict) else _scan_json_fields(text)
+    else:
+        fields = _scan_lines(text)
+    return _validate(fields, text)
+
+# --- NEW: Batched responses (one block per Queen) ---
+QUEEN_ID_PREFIX = "QUEEN ID:"
+
+def _json_batch_blocks(text):
+    data = _load_json(text)
+    if isinstance(data, dict):
+        # {"orders": [...]} as requested, or a single bare order
+        data = next((value for value in data.values() if isinstance(value, list)), [data])
+    if isinstance(data, list):
+        items = [_json_fields(item) for item in data if isinstance(item, dict)]
+    else:
+        # Local repair: undecodable JSON, scan each object on its own
+        items = [_scan_json_fields(chunk) for chunk in text.split("{")]
+
+    blocks = {}
+    for fields in items:
+        try:
+            blocks.setdefault(int(fields.get("queen_id")), fields)
+        except (TypeError, ValueError):
+            continue
+    return blocks
+
+def parse_llm_batch_command(text, queen_ids):
+    """Splits a multi-queen response on 'QUEEN ID:' lines (or JSON orders) and parses each block.
+    Returns {queen_id: parsed_result}; queens without a usable block get an error result."""
+    if _JSON_START_RE.match(text):
+        blocks = _json_batch_blocks(text)
+    else:
+        blocks = {}
+        current_id = None
+        current_lines = []
+
+        for line in text.strip().split('\n'):
+            stripped = line.strip()
+            if stripped.upper().startswith(QUEEN_ID_PREFIX):
+                if current_id is not None:
+                    blocks.setdefault(current_id, _scan_lines("\n".join(current_lines)))
+                digits = "".join(ch for ch in stripped[len(QUEEN_ID_PREFIX):] if ch.isdigit())
+                current_id = int(digits) if digits else None
+                current_lines = []
+            elif current_id is not None:
+                current_lines.append(stripped)
+        if current_id is not None:
+            blocks.setdefault(current_id, _scan_lines("\n".join(current_lines)))
+
+    results = {}
+    for queen_id in queen_ids:
+        if queen_id in blocks:
+            results[queen_id] = _validate(blocks[queen_id], "")
+        else:
+            results[queen_id] = {"status": "error", "message": f"Formatting Error: No block found for Queen {queen_id}."}
+    return results
+
+
+# --- NEW: Incremental parsing of streamed responses ---
+class StreamingCommandParser:
+    """Accumulates streamed tokens. feed() returns a parsed result the moment a
+    valid TARGET UNIT + ACTION pair has arrived on complete lines, before REMARKS.
+    Structured (JSON) replies are ready as soon as the "remarks" key shows up."""
+    def __init__(self):
+        self.text = ""
+        self.early_result = None
+        self.remark_tokens = 0
+        self._scanned_upto = 0
+        self._target_seen = False
+
+    def feed(self, chunk):
+        self.text += chunk
+        if self.early_result:
+            self.remark_tokens += 1
+            return None
+
+        if _JSON_START_RE.match(self.text):
+            # Schema order puts target and action before remarks
+            found = _JSON_REMARKS_RE.search(self.text, max(0, self._scanned_upto - 16))
+            self._scanned_upto = len(self.text)
+            if found:
+                parsed_data = _validate(_scan_json_fields(self.text[:found.start()]), "")
+                if parsed_data["status"] == "success":
+                    self.early_result = parsed_data
+                    return parsed_data
+            return None
+
+        # Only look at lines that have been terminated by a newline
+        last_newline = self.text.rfind('\n')
+        if last_newline < self._scanned_upto:
+            return None
+        complete = self.text[self._scanned_upto:last_newline]
+        self._scanned_upto = last_newline + 1
+
+        for line in complete.split('\n'):
+            line = line.strip()
+            if line.startswith("TARGET UNIT:"):
+                self._target_seen = True
+            elif line.startswith("ACTION:") and self._target_seen:
+                parsed_data = parse_llm_command(self.text[:last_newline])
+                if parsed_data["status"] == "success":
+                    self.early_result = parsed_data
+                    return parsed_data
+        return None
@@ -0,0 +1,82 @@
+# prompt_builder.py
+# Assembles prompts from named segments ordered from most static to most
+# volatile. Model servers (Ollama/llama.cpp) reuse the KV cache for the longest
+# prefix shared with the previous request, so keeping the rules and memories
+# up front means only the tail of each prompt has to be evaluated again.
+import constants
+
+# Stability levels, lowest first in the prompt
+STATIC = 0 # Rules and output format. Never change
+MATCH = 1 # Ancestral memory. Changes between matches
+ADVISOR = 2 # Human advice. Changes when the user hits Enter
+JOURNAL = 3 # Grows with every decision
+TURN = 4 # Threat report. Shared by every queen this turn
+REQUEST = 5 # The queen being asked
+
+RULES = f"""WARNING: Your response is being read by a Pygame parser. Follow these guidelines strictly.
+
+You are a Hive Mind. You set Objectives for your Queens, and they will run autonomously to execute your will.
+
+VALID ACTIONS (You MUST set exactly ONE objective per Queen. DO NOT output micro-commands like 'Produce Workers'):
+* {constants.ACTION_SET_OBJ_BALANCED} (Queen will build an equal mix of workers and warriors, attacking when her army is large.)
+* {constants.ACTION_SET_OBJ_AGGRESSIVE} (Queen will halt economy, aggressively pump out warriors, and send frequent attacks.)
+* {constants.ACTION_SET_OBJ_ECONOMY} (Queen will ignore military, build massive worker populations, and rapidly spawn new Hives.)
+"""
+
+SINGLE_FORMAT = """REQUIRED OUTPUT FORMAT:
+TARGET UNIT: QUEEN
+ACTION: [Insert exactly one valid action]
+REMARKS: [Your diary. State your grand strategy here.]
+"""
+
+BATCH_FORMAT = """REQUIRED OUTPUT FORMAT (Repeat this block once for EVERY Queen you are asked about):
+QUEEN ID: [Queen number]
+TARGET UNIT: QUEEN
+ACTION: [Insert exactly one valid action]
+REMARKS: [Your diary for this Queen. State your strategy here.]
+"""
+
+# --- NEW: Structured output (see parser.COMMAND_SCHEMA / parser.BATCH_SCHEMA) ---
+JSON_SINGLE_FORMAT = """REQUIRED OUTPUT FORMAT (a single JSON object, nothing else):
+{"target": "QUEEN", "action": "[Insert exactly one valid action]", "remarks": "[Your diary. State your grand strategy here.]"}
+"""
+
+JSON_BATCH_FORMAT = """REQUIRED OUTPUT FORMAT (a single JSON object with one order for EVERY Queen you are asked about):
+{"orders": [{"queen_id": [Queen number], "target": "QUEEN", "action": "[Insert exactly one valid action]", "remarks": "[Your diary for this Queen. State your strategy here.]"}]}
+"""
+
+# --- NEW: Follow-up for a reply the parser rejected. Sent on top of the previous
+# request's context, so only these few lines need evaluating ---
+CORRECTION_PROMPT = """Your previous reply could not be read by the parser.
+
+YOUR REPLY:
+{reply}
+
+PARSER ERROR:
+{error}
+
+{output_format}
+Repeat the same decision, corrected. Respond ONLY in the REQUIRED OUTPUT FORMAT.
+"""
+
+class PromptBuilder:
+    def __init__(self):
+        self.segments = []
+
+    def add(self, stability, text):
+        if text:
+            self.segments.append((stability, text))
+        return self
+
+    def build(self):
+        # sorted() is stable, so segments on the same level keep their insertion order
+        return "\n".join(text for _, text in sorted(self.segments, key=lambda s: s[0]))
+
+
+def shared_prefix_length(a, b):
+    # Characters two prompts have in common from the start (for cache diagnostics)
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
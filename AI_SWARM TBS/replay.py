@@ -0,0 +1,188 @@
+# replay.py
+# Compact match recordings. The engine is deterministic given its seed, so a
+# replay only stores the seed plus each queen's objective per turn (and only
+# on turns where a decision was made). Full state snapshots every
+# REPLAY_SNAPSHOT_INTERVAL turns let a replay seek to turn N without
+# re-simulating from turn 1, and never call the model. Usage:
+#   python replay.py replay.jsonl [--turn N] [--verify] [--engine vector]
+#
+# File format (JSON lines):
+#   {"seed": ..., "max_hives": ..., "map_size": [w, h], "snapshot_every": N}
+#   {"t": turn, "d": [[queen_id, objective_code], ...]}
+#   {"snapshot": {...engine.get_state(events=False)...}}
+#   {"end": turn}
+import argparse
+import json
+import time
+import constants
+from engine import GameEngine
+
+REPLAY_VERSION = 1
+OBJECTIVES = [constants.OBJ_BALANCED, constants.OBJ_AGGRESSIVE, constants.OBJ_ECONOMY]
+
+def _dumps(record):
+    return json.dumps(record, separators=(",", ":")) + "\n"
+
+
+class ReplayRecorder:
+    """Attach with engine.recorder = recorder (done by __init__). The engine
+    reports every objective it sets and every turn it ends."""
+    def __init__(self, engine, path=None, writer=None, snapshot_every=constants.REPLAY_SNAPSHOT_INTERVAL):
+        self.path = path
+        self.writer = writer # Optional file_writer.AsyncFileWriter; otherwise lines stay in memory until save()
+        self.snapshot_every = snapshot_every
+        self.lines = []
+        self._decisions = {} # queen_id -> objective code for the turn being played
+        self._turn = engine.turn_number
+
+        header = {"version": REPLAY_VERSION, "seed": engine.seed, "max_hives": engine.max_hives,
+                  "map_size": [engine.map.width, engine.map.height], "snapshot_every": snapshot_every,
+                  "start_turn": engine.turn_number}
+        self._emit(header, replace=True)
+        if engine.turn_number > 1:
+            self._emit({"snapshot": engine.get_state(events=False)}) # Resumed from a checkpoint; the seed alone can't rebuild this
+        engine.recorder = self
+
+    def _emit(self, record, replace=False):
+        line = _dumps(record)
+        if self.writer and self.path:
+            if replace: self.writer.replace(self.path, line)
+            else: self.writer.append(self.path, line)
+        else:
+            self.lines.append(line)
+
+    def record_objective(self, turn, queen_id, objective):
+        if turn != self._turn:
+            self._flush_turn()
+            self._turn = turn
+        self._decisions[queen_id] = OBJECTIVES.index(objective) # A re-applied decision just overwrites
+
+    def _flush_turn(self):
+        if self._decisions:
+            self._emit({"t": self._turn, "d": [[queen_id, code] for queen_id, code in self._decisions.items()]})
+            self._decisions = {}
+
+    def turn_ended(self, engine):
+        self._flush_turn()
+        self._turn = engine.turn_number
+        # Taken between end_turn and start_turn, the point a replay resumes from
+        if self.snapshot_every and (engine.turn_number - 1) % self.snapshot_every == 0:
+            self._emit({"snapshot": engine.get_state(events=False)}) # The event log would make every snapshot O(match)
+
+    def close(self, engine=None):
+        self._flush_turn()
+        if engine is not None:
+            self._emit({"end": engine.turn_number})
+
+    def save(self, path=None):
+        with open(path or self.path, "w") as f:
+            f.write("".join(self.lines))
+
+
+class Replay:
+    def __init__(self, header, decisions, snapshots, end_turn=None):
+        self.header = header
+        self.decisions = decisions # turn -> [(queen_id, objective)]
+        self.snapshots = snapshots # turn -> state, sorted by turn
+        self.end_turn = end_turn or max([turn + 1 for turn in decisions] + list(snapshots) + [1])
+
+    @classmethod
+    def load(cls, path):
+        header, decisions, snapshots, end_turn = None, {}, {}, None
+        with open(path) as f:
+            for line in f:
+                if not line.strip(): continue
+                record = json.loads(line)
+                if header is None:
+                    header = record
+                elif "t" in record:
+                    decisions.setdefault(record["t"], []).extend((queen_id, OBJECTIVES[code]) for queen_id, code in record["d"])
+                elif "snapshot" in record:
+                    snapshots[record["snapshot"]["turn_number"]] = record["snapshot"]
+                elif "end" in record:
+                    end_turn = record["end"]
+        if header is None:
+            raise ValueError(f"{path} is not a replay file")
+        return cls(header, decisions, dict(sorted(snapshots.items())), end_turn)
+
+    def new_engine(self, engine_class=GameEngine):
+        width, height = self.header["map_size"]
+        return engine_class(max_hives=self.header["max_hives"], map_width=width, map_height=height, seed=self.header["seed"])
+
+    def engine_at(self, turn, engine_class=GameEngine):
+        """Returns an engine positioned at the start of `turn` (before start_turn),
+        restored from the nearest snapshot and simulated forward from there."""
+        engine = self.new_engine(engine_class)
+        resume = [t for t in self.snapshots if t <= turn]
+        if not resume and self.header.get("start_turn", 1) > 1:
+            resume = [self.header["start_turn"]] # Recorded after a checkpoint resume; nothing earlier exists
+        if resume:
+            engine.set_state(self.snapshots[resume[-1]])
+        self.advance(engine, turn)
+        return engine
+
+    def advance(self, engine, turn):
+        # Same order as a live match: upkeep, recorded decisions, then the queens act
+        while engine.turn_number < turn:
+            engine.start_turn()
+            decisions = self.decisions.get(engine.turn_number)
+            if decisions:
+                queens = {queen.queen_id: queen for queen in engine.active_queens_queue}
+                for queen_id, objective in decisions:
+                    if queen_id in queens: engine.set_queen_objective(queens[queen_id], objective)
+            engine.active_queens_queue.clear()
+            engine.end_turn()
+        return engine
+
+    def verify(self, engine_class=GameEngine):
+        """Re-simulates from turn 1 and returns the snapshot turns whose state differs."""
+        engine = self.new_engine(engine_class)
+        if self.header.get("start_turn", 1) > 1:
+            engine.set_state(self.snapshots[self.header["start_turn"]])
+        mismatches = []
+        for turn, state in self.snapshots.items():
+            self.advance(engine, turn)
+            if _sim_state(engine.get_state(events=False)) != _sim_state(state):
+                mismatches.append(turn)
+        return mismatches
+
+
+def _sim_state(state):
+    # Diaries hold LLM remarks, which a replay doesn't reproduce; compare everything else
+    hives = [tuple(hive[:10]) + (tuple(tuple(q) for q in hive[10]),) for hive in state["hives"]]
+    version, internal, gauss = state["rng"]
+    return (state["turn_number"], state["next_hive_id"], state["next_queen_id"], hives, (version, tuple(internal), gauss))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Re-run a recorded AI SWARM match without the model.")
+    arg_parser.add_argument("path")
+    arg_parser.add_argument("--turn", type=int, default=None, help="Seek to this turn (default: the end of the match)")
+    arg_parser.add_argument("--verify", action="store_true", help="Re-simulate from turn 1 and check every snapshot")
+    arg_parser.add_argument("--engine", choices=["object", "vector"], default="object")
+    args = arg_parser.parse_args()
+
+    if args.engine == "vector":
+        from vector_engine import VectorGameEngine
+        engine_class = VectorGameEngine
+    else:
+        engine_class = GameEngine
+
+    replay = Replay.load(args.path)
+    turn = min(args.turn or replay.end_turn, replay.end_turn)
+    start = time.perf_counter()
+    engine = replay.engine_at(turn, engine_class)
+    elapsed = time.perf_counter() - start
+    print(f"Seed {replay.header['seed']} | {len(replay.snapshots)} snapshots | Turn {engine.turn_number} reached in {elapsed * 1000:.1f}ms")
+    for faction in (constants.FACTION_PLAYER, constants.FACTION_ENEMY):
+        print(f"{faction}: {engine.map.hive_count(faction)} hives")
+
+    if args.verify:
+        start = time.perf_counter()
+        mismatches = replay.verify(engine_class)
+        elapsed = time.perf_counter() - start
+        status = "OK" if not mismatches else f"MISMATCH at turns {mismatches}"
+        print(f"Full re-simulation to turn {replay.end_turn}: {elapsed * 1000:.1f}ms | Snapshots: {status}")
+
+if __name__ == "__main__":
+    main()
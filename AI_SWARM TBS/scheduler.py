@@ -0,0 +1,88 @@
+# scheduler.py
+# Pipelines per-queen decision requests. Objectives are independent within a
+# turn, so while one queen's reply is being applied the next few queens in
+# engine.active_queens_queue are already being answered. Replies can finish
+# in any order; they are released strictly in queue order.
+import constants
+
+class PrefetchScheduler:
+    def __init__(self, connector, depth=constants.LLM_PREFETCH_DEPTH, router=None):
+        self.connector = connector
+        self.depth = depth # How many queued queens may have a request in flight
+        self.router = router
+        self.instruction = None # Advisor text the in-flight requests were built with
+
+        self._requests = {} # queen_id -> request_id
+        self._owners = {} # request_id -> queen_id
+        self._ready = {} # queen_id -> LLMResult waiting for the queens ahead of it
+        self.released = None # request_id of the reply most recently handed to main()
+        self.prefetched = 0
+        self.invalidated = 0
+
+    @property
+    def busy(self):
+        return bool(self._requests)
+
+    def _drop(self, queen_id):
+        request_id = self._requests.pop(queen_id, None)
+        if request_id is not None:
+            self._owners.pop(request_id, None)
+            self.connector.cancel(request_id)
+        self._ready.pop(queen_id, None)
+
+    def reset(self):
+        # Turn over (or advice changed): nothing in flight is usable any more
+        for queen_id in list(self._requests):
+            self._drop(queen_id)
+        self._ready.clear()
+
+    def set_instruction(self, instruction):
+        # New advice invalidates every reply built with the old advice
+        if instruction == self.instruction: return
+        self.invalidated += len(self._requests)
+        self.reset()
+        self.instruction = instruction
+
+    def fill(self, queue, engine, instruction):
+        """Tops the pipeline up to `depth` requests for the front of the queue.
+        Returns how many new requests were issued."""
+        self.set_instruction(instruction)
+
+        # Queens that left the queue some other way (manual click, gate) free their slot
+        queued = {queen.queen_id for queen in queue}
+        for queen_id in [qid for qid in self._requests if qid not in queued]:
+            self._drop(queen_id)
+
+        issued = 0
+        for position, queen in enumerate(queue[:self.depth]):
+            if queen.queen_id in self._requests: continue
+            model = self.router.choose([queen]) if self.router else None
+            request_id = self.connector.request_action(queen, engine, instruction, model=model)
+            self._requests[queen.queen_id] = request_id
+            self._owners[request_id] = queen.queen_id
+            issued += 1
+            if position: self.prefetched += 1
+        return issued
+
+    def release(self, results, queue):
+        """Returns the results main() should handle now: everything this scheduler
+        doesn't own, plus the reply for the queen at the front of the queue."""
+        passthrough = []
+        for result in results:
+            queen_id = self._owners.get(result.request_id)
+            if queen_id is None:
+                passthrough.append(result)
+            elif not (result.partial and queen_id in self._ready):
+                self._ready[queen_id] = result # A final reply supersedes its early partial
+
+        if queue and queue[0].queen_id in self._ready:
+            queen_id = queue[0].queen_id
+            result = self._ready.pop(queen_id)
+            # From here on the request is main()'s; a streamed final reply for it passes straight through
+            self._owners.pop(self._requests.pop(queen_id), None)
+            self.released = result.request_id
+            passthrough.append(result)
+        return passthrough
+
+    def summary(self):
+        return f"Prefetch: {self.prefetched} requests issued ahead of their turn | {self.invalidated} invalidated by new advice"
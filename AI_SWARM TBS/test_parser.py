@@ -0,0 +1,30 @@
+# test_parser.py
+# Run with: python -m pytest test_parser.py (or python -m unittest test_parser)
+import unittest
+import constants
+from parser import parse_llm_command
+
+def _reply(action):
+    return f"TARGET UNIT: QUEEN\nACTION: {action}\nREMARKS: Holding the line."
+
+
+class ObjectiveRepairTest(unittest.TestCase):
+    def test_misspelled_objective_is_repaired(self):
+        parsed = parse_llm_command(_reply("Set Objective: Agressive"))
+        self.assertEqual(parsed["status"], "success")
+        self.assertEqual(parsed["action"], constants.ACTION_SET_OBJ_AGGRESSIVE)
+        self.assertTrue(parsed["repaired"])
+
+    def test_other_words_are_rejected(self):
+        # Close-ish to "Aggressive", but not what the model chose; the correction re-prompt handles them
+        for word in ("Progressive", "Defensive"):
+            with self.subTest(word=word):
+                self.assertEqual(parse_llm_command(_reply(f"Set Objective: {word}"))["status"], "error")
+                json_reply = f'{{"target": "QUEEN", "action": "Set Objective: {word}", "remarks": ""}}'
+                self.assertEqual(parse_llm_command(json_reply)["status"], "error")
+
+    def test_only_the_objective_name_is_matched(self):
+        self.assertEqual(parse_llm_command(_reply("Go aggresive on them"))["status"], "error")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,6 +2,31 @@
 import pygame
 import constants
 import pyperclip
+from collections import OrderedDict
+
+# --- NEW: font.render is the most expensive call per frame; reuse surfaces ---
+class TextCache:
+    """LRU of rendered text surfaces keyed on (text, font, colour)."""
+    def __init__(self, max_entries=constants.UI_TEXT_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (text, font, color)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
 
 class UIManager:
     def __init__(self):
@@ -12,6 +37,11 @@ class UIManager:
         self.font_main = pygame.font.SysFont('Consolas', 14)
         self.font_large = pygame.font.SysFont('Consolas', 18, bold=True)
         self.font_title = pygame.font.SysFont('Consolas', 48, bold=True)
+
+        self.text_cache = TextCache()
+        self._hive_panels = {} # hive_id -> (hive data it was drawn from, label surface)
+        self._diary_lines = (None, []) # (diary entries shown, their rendered lines)
+        self._input_layout = (None, [], 0) # (text, wrapped lines, cursor x on the last line)
         
         self.input_text = ""
         self.input_rect = pygame.Rect(
@@ -24,8 +54,19 @@ class UIManager:
         
         self.ollama_btn_rect = pygame.Rect(constants.MAP_WIDTH + 10, constants.SCREEN_HEIGHT - constants.INPUT_BOX_HEIGHT - 45, constants.TERMINAL_WIDTH - 20, 35)
         self.autoplay_btn_rect = pygame.Rect(constants.MAP_WIDTH + 10, constants.SCREEN_HEIGHT - constants.INPUT_BOX_HEIGHT - 85, constants.TERMINAL_WIDTH - 20, 35)
+        self.turbo_btn_rect = pygame.Rect(constants.MAP_WIDTH + 10, constants.SCREEN_HEIGHT - constants.INPUT_BOX_HEIGHT - 125, constants.TERMINAL_WIDTH - 20, 35)
         self.ollama_btn_hover = False
         self.autoplay_btn_hover = False
+        self.turbo_btn_hover = False
+
+        # --- NEW: Retained-mode regions. Each is redrawn only when its inputs change ---
+        self.map_rect = pygame.Rect(0, 0, constants.MAP_WIDTH, constants.SCREEN_HEIGHT)
+        self.log_rect = pygame.Rect(constants.MAP_WIDTH, 0, constants.TERMINAL_WIDTH, self.turbo_btn_rect.top)
+        self.controls_rect = pygame.Rect(constants.MAP_WIDTH, self.turbo_btn_rect.top,
+                                         constants.TERMINAL_WIDTH, constants.SCREEN_HEIGHT - self.turbo_btn_rect.top)
+        self._region_keys = {} # region name -> inputs it was last drawn with
+        self.frames_drawn = 0
+        self.frames_skipped = 0
 
         # --- Image Loading with Fallbacks ---
         try:
@@ -53,10 +94,13 @@ class UIManager:
         mouse_pos = pygame.mouse.get_pos()
         self.ollama_btn_hover = self.ollama_btn_rect.collidepoint(mouse_pos)
         self.autoplay_btn_hover = self.autoplay_btn_rect.collidepoint(mouse_pos)
+        self.turbo_btn_hover = self.turbo_btn_rect.collidepoint(mouse_pos)
         
         for event in events:
             if event.type == pygame.QUIT:
                 return "QUIT", None
+            if event.type == pygame.VIDEOEXPOSE:
+                self._region_keys.clear() # The window was uncovered; repaint everything
                 
             if event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
@@ -64,6 +108,8 @@ class UIManager:
                         action_signal = "OLLAMA_CLICK"
                     elif self.autoplay_btn_rect.collidepoint(event.pos):
                         action_signal = "AUTOPLAY_TOGGLE"
+                    elif self.turbo_btn_rect.collidepoint(event.pos):
+                        action_signal = "TURBO_TOGGLE"
                         
                     if self.input_rect.collidepoint(event.pos):
                         self.input_active = True
@@ -87,100 +133,149 @@ class UIManager:
         return submitted_text, action_signal
 
     # Update the draw method signature to accept active_instruction
-    def draw(self, engine, prompt_message, error_message="", is_generating=False, auto_play=False, active_instruction=""):
-        self.screen.fill(constants.COLOR_BG_MAP)
-        self._draw_map(engine)
-        self._draw_terminal(prompt_message, error_message, engine, is_generating, auto_play, active_instruction)
-        pygame.display.flip()
+    # Renders a game_controller.GameSnapshot; the UI never touches the live engine
+    def draw(self, snapshot):
+        self._update_cursor_blink()
 
-    def _draw_map(self, engine):
+        if snapshot.is_generating:
+            display_prompt = "Hive Mind is thinking... (Please wait)"
+            prompt_color = (255, 200, 50) 
+        else:
+            display_prompt = snapshot.prompt_message
+            prompt_color = constants.COLOR_HIGHLIGHT
+
+        dirty_rects = []
+        if self._region_changed("map", (snapshot.turn_number, snapshot.max_hives, snapshot.hives)):
+            self._draw_region(self.map_rect, dirty_rects, self._draw_map, snapshot)
+        if self._region_changed("log", (display_prompt, prompt_color, snapshot.error_message, snapshot.recent_diaries)):
+            self._draw_region(self.log_rect, dirty_rects, self._draw_log, display_prompt, prompt_color, snapshot.error_message, snapshot.recent_diaries)
+        controls_key = (snapshot.is_generating, snapshot.auto_play, snapshot.turbo, self.ollama_btn_hover, self.autoplay_btn_hover,
+                        self.turbo_btn_hover, snapshot.active_instruction, self.input_text, self.input_active, self.cursor_visible)
+        if self._region_changed("controls", controls_key):
+            self._draw_region(self.controls_rect, dirty_rects, self._draw_controls, snapshot.is_generating, snapshot.auto_play,
+                              snapshot.active_instruction, snapshot.turbo)
+
+        if not dirty_rects:
+            self.frames_skipped += 1
+            return # Nothing changed: no drawing and no display update at all
+        dirty_rects.append(pygame.draw.line(self.screen, constants.COLOR_HIGHLIGHT, (constants.MAP_WIDTH, 0), (constants.MAP_WIDTH, constants.SCREEN_HEIGHT), 2))
+        self.frames_drawn += 1
+        if constants.UI_DIRTY_RECTS:
+            pygame.display.update(dirty_rects)
+        else:
+            pygame.display.flip()
+
+    def _region_changed(self, name, key):
+        if constants.UI_DIRTY_RECTS and self._region_keys.get(name) == key:
+            return False
+        self._region_keys[name] = key
+        return True
+
+    def _draw_region(self, rect, dirty_rects, draw_function, *args):
+        # Clipped so a region can never paint over its neighbours
+        self.screen.set_clip(rect)
+        draw_function(*args)
+        self.screen.set_clip(None)
+        dirty_rects.append(rect)
+
+    def _draw_map(self, snapshot):
         # Draw Image Background or fallback color
         if self.img_bg:
             self.screen.blit(self.img_bg, (0, 0))
         else:
             pygame.draw.rect(self.screen, constants.COLOR_BG_MAP, (0, 0, constants.MAP_WIDTH, constants.SCREEN_HEIGHT))
 
-        turn_surface = self.font_large.render(f"TURN: {engine.turn_number} | TOTAL HIVES: {len(engine.map.hives)}/{constants.MAX_HIVES}", True, constants.COLOR_TEXT)
+        turn_surface = self.text_cache.render(self.font_large, f"TURN: {snapshot.turn_number} | TOTAL HIVES: {len(snapshot.hives)}/{snapshot.max_hives}", constants.COLOR_TEXT)
         self.screen.blit(turn_surface, (20, 20))
         
-        for hive in engine.map.hives:
+        for hive in snapshot.hives:
             # Render Hive Sprite or fallback square
             if hive.faction == constants.FACTION_PLAYER:
                 if self.img_hive_blue: self.screen.blit(self.img_hive_blue, (hive.x, hive.y))
                 else: pygame.draw.rect(self.screen, constants.COLOR_HIVE_BLUE, (hive.x, hive.y, 40, 40))
-                id_label = f"HIVE {hive.hive_id} (BLUE)"
             else:
                 if self.img_hive_red: self.screen.blit(self.img_hive_red, (hive.x, hive.y))
                 else: pygame.draw.rect(self.screen, constants.COLOR_HIVE_RED, (hive.x, hive.y, 40, 40))
-                id_label = f"HIVE {hive.hive_id} (RED)"
-            
-            current_obj = hive.queens[0].objective if hive.queens else "Dead"
-            obj_text = self.font_main.render(f"[{current_obj}]", True, (200, 200, 50))
-            
-            id_text = self.font_main.render(id_label, True, constants.COLOR_HIGHLIGHT)
-            food_text = self.font_main.render(f"Food: {hive.food}", True, constants.COLOR_TEXT)
-            pop_text = self.font_main.render(f"Wkr:{hive.workers} War:{hive.warriors}", True, constants.COLOR_TEXT)
-            
-            self.screen.blit(obj_text, (hive.x, hive.y - 60))
-            self.screen.blit(id_text, (hive.x, hive.y - 45))
-            self.screen.blit(food_text, (hive.x, hive.y - 30))
-            self.screen.blit(pop_text, (hive.x, hive.y - 15))
+            self.screen.blit(self._hive_panel(hive), (hive.x, hive.y - 60))
 
-    # Update _draw_terminal signature and add the text box labels
-    def _draw_terminal(self, prompt_message, error_message, engine, is_generating, auto_play, active_instruction):
-        terminal_rect = pygame.Rect(constants.MAP_WIDTH, 0, constants.TERMINAL_WIDTH, constants.SCREEN_HEIGHT)
-        pygame.draw.rect(self.screen, constants.COLOR_BG_TERMINAL, terminal_rect)
-        pygame.draw.line(self.screen, constants.COLOR_HIGHLIGHT, (constants.MAP_WIDTH, 0), (constants.MAP_WIDTH, constants.SCREEN_HEIGHT), 2)
+        # Forget panels of hives that no longer exist
+        if len(self._hive_panels) > len(snapshot.hives):
+            live_ids = {hive.hive_id for hive in snapshot.hives}
+            self._hive_panels = {hive_id: panel for hive_id, panel in self._hive_panels.items() if hive_id in live_ids}
 
+    def _hive_panel(self, hive):
+        # The four label lines above a hive, re-rendered only when the numbers change
+        current_obj = hive.objective or "Dead"
+        data = (hive.faction, current_obj, hive.food, hive.workers, hive.warriors)
+        cached = self._hive_panels.get(hive.hive_id)
+        if cached is not None and cached[0] == data:
+            return cached[1]
+
+        faction_label = "BLUE" if hive.faction == constants.FACTION_PLAYER else "RED"
+        lines = [
+            self.text_cache.render(self.font_main, f"[{current_obj}]", (200, 200, 50)),
+            self.text_cache.render(self.font_main, f"HIVE {hive.hive_id} ({faction_label})", constants.COLOR_HIGHLIGHT),
+            # Counts change every turn; the panel itself is the cache for these two
+            self.font_main.render(f"Food: {hive.food}", True, constants.COLOR_TEXT),
+            self.font_main.render(f"Wkr:{hive.workers} War:{hive.warriors}", True, constants.COLOR_TEXT),
+        ]
+        panel = pygame.Surface((max(line.get_width() for line in lines), 45 + lines[-1].get_height()), pygame.SRCALPHA)
+        for i, line in enumerate(lines):
+            panel.blit(line, (0, i * 15))
+        self._hive_panels[hive.hive_id] = (data, panel)
+        return panel
+
+    # The terminal is split in two regions: the log (prompt, error, diaries) and the controls below it
+    def _draw_log(self, display_prompt, prompt_color, error_message, recent_diaries):
+        pygame.draw.rect(self.screen, constants.COLOR_BG_TERMINAL, self.log_rect)
         y_offset = 20
-        
-        if is_generating:
-            display_prompt = "Hive Mind is thinking... (Please wait)"
-            prompt_color = (255, 200, 50) 
-        else:
-            display_prompt = prompt_message
-            prompt_color = constants.COLOR_HIGHLIGHT
             
-        prompt_surface = self.font_large.render(display_prompt, True, prompt_color)
+        prompt_surface = self.text_cache.render(self.font_large, display_prompt, prompt_color)
         self.screen.blit(prompt_surface, (constants.MAP_WIDTH + 10, y_offset))
         y_offset += 30
 
         if error_message:
-            error_surface = self.font_main.render(error_message, True, (255, 100, 100))
+            error_surface = self.text_cache.render(self.font_main, error_message, (255, 100, 100))
             self.screen.blit(error_surface, (constants.MAP_WIDTH + 10, y_offset))
             y_offset += 25
 
         y_offset += 10
-        recent_diaries = []
-        for hive in engine.map.hives:
-            recent_diaries.extend(hive.diaries)
-        
-        for log in recent_diaries[-5:]:
-            for line in log.split('\n'):
-                log_surface = self.font_main.render(line, True, constants.COLOR_TEXT)
+        for line_surfaces in self._diary_lines_for(recent_diaries):
+            for log_surface in line_surfaces:
                 self.screen.blit(log_surface, (constants.MAP_WIDTH + 10, y_offset))
                 y_offset += 15
             y_offset += 10
 
+    def _draw_controls(self, is_generating, auto_play, active_instruction, turbo):
+        pygame.draw.rect(self.screen, constants.COLOR_BG_TERMINAL, self.controls_rect)
+
+        # --- NEW: Turbo. Turns run flat out; the screen only refreshes every few turns ---
+        turbo_color = (255, 140, 40) if turbo else (100, 100, 100)
+        if self.turbo_btn_hover and not turbo: turbo_color = (120, 120, 120)
+        pygame.draw.rect(self.screen, turbo_color, self.turbo_btn_rect)
+        turbo_text_str = f"TURBO: ON (every {constants.TURBO_RENDER_EVERY_TURNS} turns)" if turbo else "TURBO: OFF"
+        turbo_text = self.text_cache.render(self.font_large, turbo_text_str, (10, 10, 10))
+        self.screen.blit(turbo_text, turbo_text.get_rect(center=self.turbo_btn_rect.center))
+
         if is_generating:
             btn_color = (100, 100, 100) 
         else:
             btn_color = constants.COLOR_HIGHLIGHT if self.ollama_btn_hover else (80, 120, 80)
         pygame.draw.rect(self.screen, btn_color, self.ollama_btn_rect)
-        btn_text = self.font_large.render("Ask Hive Mind (Ollama)", True, (10, 10, 10))
+        btn_text = self.text_cache.render(self.font_large, "Ask Hive Mind (Ollama)", (10, 10, 10))
         self.screen.blit(btn_text, btn_text.get_rect(center=self.ollama_btn_rect.center))
 
         ap_color = (50, 200, 255) if auto_play else (100, 100, 100)
         if self.autoplay_btn_hover and not auto_play: ap_color = (120, 120, 120)
         pygame.draw.rect(self.screen, ap_color, self.autoplay_btn_rect)
         ap_text_str = "AUTO-PLAY: ON" if auto_play else "AUTO-PLAY: OFF"
-        ap_text = self.font_large.render(ap_text_str, True, (10, 10, 10))
+        ap_text = self.text_cache.render(self.font_large, ap_text_str, (10, 10, 10))
         self.screen.blit(ap_text, ap_text.get_rect(center=self.autoplay_btn_rect.center))
 
         # --- FEATURE 2: ADVISOR UI LABELS ---
         # Draw the "Active Instruction" label above the input box
         instruction_label = "Current Advice: " + (active_instruction if active_instruction else "None (Type below)")
-        inst_surface = self.font_main.render(instruction_label, True, (255, 200, 50))
+        inst_surface = self.text_cache.render(self.font_main, instruction_label, (255, 200, 50))
         self.screen.blit(inst_surface, (self.input_rect.x, self.input_rect.y - 25))
 
         # Draw Input Box Background
@@ -188,7 +283,17 @@ class UIManager:
         border_color = constants.COLOR_HIGHLIGHT if self.input_active else (80, 80, 80)
         pygame.draw.rect(self.screen, border_color, self.input_rect, 2)
         self._draw_multiline_text_with_cursor(self.input_text, self.input_rect.x + 5, self.input_rect.y + 5, self.input_rect.width - 10)
-    def _draw_multiline_text_with_cursor(self, text, x, y, max_width):
+
+    def _diary_lines_for(self, key):
+        if key != self._diary_lines[0]:
+            rendered = [[self.text_cache.render(self.font_main, line, constants.COLOR_TEXT) for line in log.split('\n')] for log in key]
+            self._diary_lines = (key, rendered)
+        return self._diary_lines[1]
+
+    def _wrap_input(self, text, max_width):
+        # Word-wrap layout of the input box, recomputed only when the text changes
+        if self._input_layout[0] == (text, max_width):
+            return self._input_layout[1], self._input_layout[2]
         words = text.replace('\n', ' \n ').split(' ')
         lines = []
         current_line = ""
@@ -204,21 +309,30 @@ class UIManager:
                 lines.append(current_line)
                 current_line = word + " "
         lines.append(current_line)
+        cursor_offset = self.font_main.size(lines[-1])[0]
+        self._input_layout = ((text, max_width), lines, cursor_offset)
+        return lines, cursor_offset
+
+    def _draw_multiline_text_with_cursor(self, text, x, y, max_width):
+        lines, cursor_offset = self._wrap_input(text, max_width)
         
         for i, line in enumerate(lines):
-            text_surface = self.font_main.render(line, True, constants.COLOR_TEXT)
+            text_surface = self.text_cache.render(self.font_main, line, constants.COLOR_TEXT)
             self.screen.blit(text_surface, (x, y + (i * 18)))
 
+        if self.input_active and self.cursor_visible:
+            cursor_x = x + cursor_offset
+            cursor_y = y + ((len(lines) - 1) * 18)
+            cursor_surface = self.text_cache.render(self.font_main, "_", constants.COLOR_HIGHLIGHT)
+            self.screen.blit(cursor_surface, (cursor_x, cursor_y))
+
+    def _update_cursor_blink(self):
+        # Runs every frame, drawn or not, so the blink keeps its rhythm
         if self.input_active:
             self.cursor_timer += 1
             if self.cursor_timer >= constants.FPS // 2:
                 self.cursor_visible = not self.cursor_visible
                 self.cursor_timer = 0
-            if self.cursor_visible:
-                cursor_x = x + self.font_main.size(lines[-1])[0]
-                cursor_y = y + ((len(lines) - 1) * 18)
-                cursor_surface = self.font_main.render("_", True, constants.COLOR_HIGHLIGHT)
-                self.screen.blit(cursor_surface, (cursor_x, cursor_y))
         else:
             self.cursor_timer = 0
             self.cursor_visible = True
@@ -236,4 +350,5 @@ class UIManager:
         
         self.screen.blit(text_surface, text_rect)
         self.screen.blit(sub_text, sub_rect)
-        pygame.display.flip()
\ No newline at end of file
+        pygame.display.flip()
+        self._region_keys.clear()
\ No newline at end of file
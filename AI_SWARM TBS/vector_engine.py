@@ -0,0 +1,488 @@
+# vector_engine.py
+# Optional NumPy backend for GameEngine. Hive state lives in flat arrays
+# (struct-of-arrays) so upkeep, queen decisions, production and gathering run
+# as one vectorized pass per turn instead of a Python loop per hive.
+#
+# Given the same seed it produces exactly the same matches as
+# engine.GameEngine. Queen spawns and target picks draw from the RNG, so they
+# run in hive order; production, the grouped combat phase (np.add.at per
+# target) and gathering are whole-array passes.
+import math
+import random
+import numpy as np
+import constants
+from engine import SpatialGrid, FactionStats, HIVE_SPACING
+from events import EventLog, Diary, restore_diary, EVENT_OBJECTIVE, EVENT_COMBAT, EVENT_SPAWN, EVENT_DESTROYED
+
+FACTIONS = [constants.FACTION_PLAYER, constants.FACTION_ENEMY]
+OBJECTIVES = [constants.OBJ_BALANCED, constants.OBJ_AGGRESSIVE, constants.OBJ_ECONOMY]
+
+OBJ_BALANCED, OBJ_AGGRESSIVE, OBJ_ECONOMY = 0, 1, 2
+
+ACTION_NONE = 0
+ACTION_GATHER_FOOD = 1
+ACTION_PRODUCE_WORKERS = 2
+ACTION_PRODUCE_WARRIORS = 3
+ACTION_PRODUCE_QUEEN = 4
+ACTION_ATTACK = 5
+
+ACTION_NAMES = [
+    None,
+    constants.ACTION_GATHER_FOOD,
+    constants.ACTION_PRODUCE_WORKERS,
+    constants.ACTION_PRODUCE_WARRIORS,
+    constants.ACTION_PRODUCE_QUEEN,
+    constants.ACTION_ATTACK,
+]
+
+# Column name -> dtype. Every hive is one row across all of these arrays.
+HIVE_FIELDS = {
+    "hive_id": np.int64,
+    "queen_id": np.int64,
+    "x": np.float64,
+    "y": np.float64,
+    "faction": np.int8,
+    "food": np.int64,
+    "workers": np.int64,
+    "warriors": np.int64,
+    "queen_count": np.int64,
+    "objective": np.int8,
+    "action": np.int8,
+    "gathering_modifier": np.float64,
+    "attack_multiplier": np.int64,
+    "defense_multiplier": np.int64,
+    "is_destroyed": np.bool_,
+}
+
+# ==========================================
+# OBJECT VIEWS
+# ==========================================
+# Light proxies so the UI, the prompt builder and the headless runner can keep
+# using hive.food / queen.objective etc. A view is only valid until the next
+# end_turn(), because destroyed rows are compacted away there.
+
+class HiveView:
+    __slots__ = ("_engine", "_row")
+
+    def __init__(self, engine, row):
+        self._engine = engine
+        self._row = row
+
+    def _get(self, field):
+        return getattr(self._engine, field)[self._row].item()
+
+    def _set(self, field, value):
+        getattr(self._engine, field)[self._row] = value
+
+    hive_id = property(lambda self: self._get("hive_id"))
+    x = property(lambda self: self._get("x"))
+    y = property(lambda self: self._get("y"))
+    food = property(lambda self: self._get("food"), lambda self, v: self._set("food", v))
+    workers = property(lambda self: self._get("workers"), lambda self, v: self._set("workers", v))
+    warriors = property(lambda self: self._get("warriors"), lambda self, v: self._set("warriors", v))
+    gathering_modifier = property(lambda self: self._get("gathering_modifier"))
+    attack_multiplier = property(lambda self: self._get("attack_multiplier"))
+    defense_multiplier = property(lambda self: self._get("defense_multiplier"))
+    is_destroyed = property(lambda self: self._get("is_destroyed"))
+
+    @property
+    def faction(self):
+        return FACTIONS[self._get("faction")]
+
+    @property
+    def diaries(self):
+        return self._engine.diaries[self._row]
+
+    @property
+    def queens(self):
+        return [QueenView(self._engine, self._row)] if self._get("queen_count") else []
+
+
+class QueenView:
+    __slots__ = ("_engine", "_row")
+
+    def __init__(self, engine, row):
+        self._engine = engine
+        self._row = row
+
+    @property
+    def hive(self):
+        return HiveView(self._engine, self._row)
+
+    @property
+    def queen_id(self):
+        return self._engine.queen_id[self._row].item()
+
+    @property
+    def objective(self):
+        return OBJECTIVES[self._engine.objective[self._row]]
+
+    @objective.setter
+    def objective(self, value):
+        self._engine.objective[self._row] = OBJECTIVES.index(value)
+
+    @property
+    def action_queued(self):
+        return ACTION_NAMES[self._engine.action[self._row]]
+
+
+class VectorMap:
+    def __init__(self, engine, width, height):
+        self._engine = engine
+        self.width = width
+        self.height = height
+        self.hive_index = SpatialGrid() # Keyed by hive_id, rows move on compaction
+
+    def is_crowded(self, x, y):
+        return self.hive_index.any_within(x, y, HIVE_SPACING)
+
+    @property
+    def hives(self):
+        return [HiveView(self._engine, row) for row in range(self._engine.count)]
+
+    # Same accessors as engine.Map, computed as masked array sums
+    def faction_stats(self, faction):
+        engine = self._engine
+        n = engine.count
+        mask = (engine.faction[:n] == FACTIONS.index(faction)) & ~engine.is_destroyed[:n]
+        stats = FactionStats()
+        stats.hives = int(mask.sum())
+        stats.food = int(engine.food[:n][mask].sum())
+        stats.workers = int(engine.workers[:n][mask].sum())
+        stats.warriors = int(engine.warriors[:n][mask].sum())
+        return stats
+
+    def hive_count(self, faction):
+        engine = self._engine
+        n = engine.count
+        return int(((engine.faction[:n] == FACTIONS.index(faction)) & ~engine.is_destroyed[:n]).sum())
+
+# ==========================================
+# ENGINE
+# ==========================================
+
+class VectorGameEngine:
+    def __init__(self, max_hives=constants.MAX_HIVES, map_width=constants.MAP_WIDTH, map_height=constants.MAP_HEIGHT, capacity=64, seed=None):
+        self.map = VectorMap(self, map_width, map_height)
+        self.max_hives = max_hives
+        self.turn_number = 1
+        self.active_queens_queue = []
+        self._next_hive_id = 1
+        self._next_queen_id = 1
+
+        # Per-engine RNG, seeded exactly like GameEngine
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.recorder = None # Optional replay.ReplayRecorder
+
+        self.count = 0
+        self.capacity = 0
+        for field, dtype in HIVE_FIELDS.items():
+            setattr(self, field, np.zeros(0, dtype=dtype))
+        self.events = EventLog()
+        self.diaries = [] # One events.Diary per row
+        self._ensure_capacity(capacity)
+        self._create_initial_hives()
+
+    def _ensure_capacity(self, needed):
+        if needed <= self.capacity: return
+        new_capacity = max(needed, self.capacity * 2, 16)
+        for field, dtype in HIVE_FIELDS.items():
+            grown = np.zeros(new_capacity, dtype=dtype)
+            grown[:self.count] = getattr(self, field)[:self.count]
+            setattr(self, field, grown)
+        self.capacity = new_capacity
+
+    def _add_hive(self, x, y, faction_code):
+        self._ensure_capacity(self.count + 1)
+        row = self.count
+        self.hive_id[row] = self._next_hive_id
+        self._next_hive_id += 1
+        self.queen_id[row] = self._next_queen_id
+        self._next_queen_id += 1
+        self.x[row] = x
+        self.y[row] = y
+        self.faction[row] = faction_code
+        self.food[row] = constants.STARTING_FOOD
+        self.workers[row] = constants.STARTING_WORKERS
+        self.warriors[row] = constants.STARTING_WARRIORS
+        self.queen_count[row] = 1
+        self.objective[row] = OBJ_BALANCED
+        self.action[row] = ACTION_NONE
+        self.gathering_modifier[row] = 1.0
+        self.attack_multiplier[row] = 1
+        self.defense_multiplier[row] = 2
+        self.is_destroyed[row] = False
+        self.diaries.append(Diary(self.events))
+        self.map.hive_index.insert(int(self.hive_id[row]), x, y)
+        self.count += 1
+        return row
+
+    def _create_initial_hives(self):
+        self._add_hive(self.map.width // 4, self.map.height // 2, 0)
+        self._add_hive((self.map.width // 4) * 3, self.map.height // 2, 1)
+
+    def start_turn(self):
+        n = self.count
+        total_upkeep = (self.queen_count[:n] * constants.UPKEEP_QUEEN) + \
+                       (self.warriors[:n] * constants.UPKEEP_WARRIOR) + \
+                       (self.workers[:n] * constants.UPKEEP_WORKER)
+        food = self.food[:n]
+        food -= total_upkeep
+        np.maximum(food, 0, out=food)
+        self.gathering_modifier[:n] = 1.0
+
+        player_rows = np.flatnonzero(self.faction[:n] == FACTIONS.index(constants.FACTION_PLAYER))
+        self.active_queens_queue = [QueenView(self, row) for row in player_rows.tolist()]
+
+    def process_queen_command(self, queen, parsed_data):
+        self.set_queen_objective(queen, parsed_data['action'])
+        self.log_queen_remarks(queen, parsed_data['remarks'])
+
+    # --- NEW: Split so a streamed ACTION can apply before its REMARKS arrive ---
+    def set_queen_objective(self, queen, action_str):
+        if constants.OBJ_AGGRESSIVE in action_str:
+            queen.objective = constants.OBJ_AGGRESSIVE
+        elif constants.OBJ_ECONOMY in action_str:
+            queen.objective = constants.OBJ_ECONOMY
+        else:
+            queen.objective = constants.OBJ_BALANCED
+        if self.recorder: self.recorder.record_objective(self.turn_number, queen.queen_id, queen.objective)
+
+    def log_queen_remarks(self, queen, remarks, turn=None):
+        turn = self.turn_number if turn is None else turn
+        log_entry = f"Turn {turn} | Hive {queen.hive.hive_id} | Objective Updated: {queen.objective}\nRemarks: {remarks}"
+        self._log_event(EVENT_OBJECTIVE, queen.hive._row, log_entry, diary=True, turn=turn)
+
+    def _log_event(self, kind, row, text, diary=False, turn=None):
+        ref = self.events.append(text, kind, self.turn_number if turn is None else turn,
+                                 int(self.hive_id[row]), FACTIONS[self.faction[row]])
+        if diary: self.diaries[row].add(ref)
+
+    def _determine_queen_actions(self):
+        # Same priority ladders as GameEngine._determine_queen_action, written
+        # as masked selects: the first matching condition wins.
+        n = self.count
+        food, workers, warriors = self.food[:n], self.workers[:n], self.warriors[:n]
+        can_expand = n < self.max_hives
+
+        low_food = food < constants.COST_WORKER
+        can_afford_warrior = food >= constants.COST_WARRIOR
+        can_afford_queen = (food >= constants.COST_QUEEN) & can_expand
+
+        economy = np.select(
+            [low_food, workers < 25, can_afford_queen],
+            [ACTION_GATHER_FOOD, ACTION_PRODUCE_WORKERS, ACTION_PRODUCE_QUEEN],
+            ACTION_GATHER_FOOD,
+        )
+        aggressive = np.select(
+            [~can_afford_warrior, workers < 5, (warriors < 8) & can_afford_warrior, warriors >= 8],
+            [ACTION_GATHER_FOOD, ACTION_PRODUCE_WORKERS, ACTION_PRODUCE_WARRIORS, ACTION_ATTACK],
+            ACTION_GATHER_FOOD,
+        )
+        balanced = np.select(
+            [low_food, workers < 10, (warriors < 15) & can_afford_warrior, warriors >= 15, can_afford_queen],
+            [ACTION_GATHER_FOOD, ACTION_PRODUCE_WORKERS, ACTION_PRODUCE_WARRIORS, ACTION_ATTACK, ACTION_PRODUCE_QUEEN],
+            ACTION_GATHER_FOOD,
+        )
+
+        objective = self.objective[:n]
+        actions = np.where(objective == OBJ_ECONOMY, economy, np.where(objective == OBJ_AGGRESSIVE, aggressive, balanced))
+        actions[(self.queen_count[:n] == 0) | self.is_destroyed[:n]] = ACTION_NONE
+        self.action[:n] = actions
+
+    def _produce(self, n):
+        # Rows [0, n) act at once: nothing here touches another hive
+        live = ~self.is_destroyed[:n]
+        action = self.action[:n]
+        food = self.food[:n]
+        workers = self.workers[:n]
+        warriors = self.warriors[:n]
+
+        self.gathering_modifier[:n][(action == ACTION_GATHER_FOOD) & live] = constants.GATHER_RATE_BOOSTED / constants.GATHER_RATE_BASE
+
+        build_workers = (action == ACTION_PRODUCE_WORKERS) & live & (food >= constants.COST_WORKER)
+        food[build_workers] -= constants.COST_WORKER
+        workers[build_workers] += 1
+
+        build_warriors = (action == ACTION_PRODUCE_WARRIORS) & live & (food >= constants.COST_WARRIOR)
+        food[build_warriors] -= constants.COST_WARRIOR
+        warriors[build_warriors] += 1
+
+    def _gather(self):
+        n = self.count
+        live = ~self.is_destroyed[:n]
+        income = (self.workers[:n] * constants.GATHER_RATE_BASE * self.gathering_modifier[:n]).astype(np.int64)
+        self.food[:n][live] += income[live]
+
+    def _get_valid_spawn_location(self, row):
+        origin_x, origin_y = self.x[row], self.y[row]
+        for _ in range(20):
+            angle = self.rng.uniform(0, 2 * math.pi)
+            distance = self.rng.uniform(150, 250)
+            new_x = origin_x + distance * math.cos(angle)
+            new_y = origin_y + distance * math.sin(angle)
+
+            new_x = max(40, min(self.map.width - 80, new_x))
+            new_y = max(40, min(self.map.height - 80, new_y))
+
+            if not self.map.is_crowded(new_x, new_y):
+                return new_x, new_y
+        return None
+
+    def _spawn(self, row):
+        if self.food[row] >= constants.COST_QUEEN and self.count < self.max_hives:
+            spawn_loc = self._get_valid_spawn_location(row)
+            if spawn_loc:
+                self.food[row] -= constants.COST_QUEEN
+                new_row = self._add_hive(spawn_loc[0], spawn_loc[1], self.faction[row])
+                self._log_event(EVENT_SPAWN, new_row,
+                                f"--> SPAWN: Hive {self.hive_id[row]} founded Hive {self.hive_id[new_row]} ({FACTIONS[self.faction[new_row]]})")
+
+    def _resolve_combat(self, attackers):
+        # Same rules as GameEngine._resolve_combat, as one grouped pass over every engagement
+        n = self.count
+        enemies = {}
+        picked, targets = [], []
+        for row in attackers.tolist():
+            faction = self.faction[row]
+            if faction not in enemies:
+                enemies[faction] = np.flatnonzero((self.faction[:n] != faction) & ~self.is_destroyed[:n]).tolist()
+            if enemies[faction]:
+                picked.append(row)
+                targets.append(self.rng.choice(enemies[faction]))
+        if not picked: return
+        att = np.array(picked)
+        tgt = np.array(targets)
+
+        power = self.warriors[att] * self.attack_multiplier[att]
+        total = np.zeros(n, dtype=np.int64)
+        np.add.at(total, tgt, power)
+        attacking = np.zeros(n, dtype=np.bool_)
+        attacking[att] = True
+        defense = np.where(attacking, 0, self.warriors[:n]) * self.defense_multiplier[:n]
+
+        for row, target, row_power in zip(att.tolist(), tgt.tolist(), power.tolist()):
+            log_entry = f"--> COMBAT: Hive {self.hive_id[row]} ({row_power} Pwr) attacked Hive {self.hive_id[target]} ({defense[target]} Pwr)!"
+            self._log_event(EVENT_COMBAT, row, log_entry, diary=True)
+
+        # Survivors split each target's leftover power by contribution (integer ceil, like the object engine)
+        attack_power = total[tgt]
+        broken = attack_power >= defense[tgt]
+        survivors = np.where(broken, -(-(attack_power - defense[tgt]) * power // (attack_power * self.attack_multiplier[att])), 0)
+        damage = np.zeros(n, dtype=np.int64)
+        np.add.at(damage, tgt, survivors)
+
+        _, first = np.unique(tgt, return_index=True)
+        engaged = tgt[np.sort(first)] # Targets in order of first attack
+        held = engaged[total[engaged] < defense[engaged]]
+        won = engaged[total[engaged] >= defense[engaged]]
+        overrun = won[damage[won] >= self.workers[won]]
+
+        self.warriors[att] = survivors
+        self.warriors[held] = -(-(defense[held] - total[held]) // self.defense_multiplier[held])
+        self.warriors[won[~attacking[won]]] = 0
+        self.workers[won] = np.maximum(self.workers[won] - damage[won], 0)
+        self.is_destroyed[overrun] = True
+
+        for target in overrun.tolist():
+            overrun_by = ", ".join(str(self.hive_id[row]) for row in att[tgt == target].tolist())
+            self._log_event(EVENT_DESTROYED, target,
+                            f"--> DESTROYED: Hive {self.hive_id[target]} ({FACTIONS[self.faction[target]]}) was overrun by Hive {overrun_by}")
+
+    def _compact(self):
+        n = self.count
+        keep = ~self.is_destroyed[:n]
+        if keep.all(): return
+        kept = int(keep.sum())
+        for row in np.flatnonzero(~keep).tolist():
+            self.map.hive_index.remove(int(self.hive_id[row]), self.x[row], self.y[row])
+        for field in HIVE_FIELDS:
+            column = getattr(self, field)
+            column[:kept] = column[:n][keep]
+        self.diaries = [d for d, k in zip(self.diaries, keep.tolist()) if k]
+        self.count = kept
+
+    def end_turn(self):
+        self._determine_queen_actions()
+
+        n = self.count
+        self._produce(n)
+        for row in np.flatnonzero(self.action[:n] == ACTION_PRODUCE_QUEEN).tolist():
+            self._spawn(row)
+        self.action[n:self.count] = ACTION_NONE # Hives spawned this turn only gather
+
+        self._resolve_combat(np.flatnonzero((self.action[:n] == ACTION_ATTACK) & (self.warriors[:n] > 0)))
+        self._gather()
+
+        self._compact()
+        self.turn_number += 1
+        if self.recorder: self.recorder.turn_ended(self)
+
+    # Same snapshot layout as GameEngine.get_state / set_state
+    def get_state(self, events=True):
+        n = self.count
+        live = np.flatnonzero(~self.is_destroyed[:n]).tolist()
+        hives = []
+        for row in live:
+            queens = [(self.queen_id[row].item(), OBJECTIVES[self.objective[row]])] if self.queen_count[row] else []
+            hives.append((self.hive_id[row].item(), self.x[row].item(), self.y[row].item(), FACTIONS[self.faction[row]],
+                          self.food[row].item(), self.workers[row].item(), self.warriors[row].item(),
+                          self.gathering_modifier[row].item(), self.attack_multiplier[row].item(),
+                          self.defense_multiplier[row].item(), queens, list(self.diaries[row])))
+        state = {
+            "turn_number": self.turn_number,
+            "next_hive_id": self._next_hive_id,
+            "next_queen_id": self._next_queen_id,
+            "max_hives": self.max_hives,
+            "map_size": (self.map.width, self.map.height),
+            "seed": self.seed,
+            "rng": self.rng.getstate(),
+            "hives": hives,
+            "queue": [queen.queen_id for queen in self.active_queens_queue],
+        }
+        if events:
+            state["events"] = self.events.get_state()
+            state["diaries"] = [self.diaries[row].get_state() for row in live]
+        return state
+
+    def set_state(self, state):
+        width, height = state["map_size"]
+        self.map = VectorMap(self, width, height)
+        self.events = EventLog.from_state(state["events"]) if "events" in state else EventLog()
+        self.max_hives = state["max_hives"]
+        self.turn_number = state["turn_number"]
+        self._next_hive_id = state["next_hive_id"]
+        self._next_queen_id = state["next_queen_id"]
+        self.seed = state["seed"]
+        version, internal, gauss = state["rng"]
+        self.rng.setstate((version, tuple(internal), gauss))
+
+        self.count = 0
+        self.diaries = []
+        self._ensure_capacity(len(state["hives"]))
+        rows_by_queen = {}
+        for row, (hive_id, x, y, faction, food, workers, warriors, modifier, attack, defense, queens, diaries) in enumerate(state["hives"]):
+            self.hive_id[row] = hive_id
+            self.x[row] = x
+            self.y[row] = y
+            self.faction[row] = FACTIONS.index(faction)
+            self.food[row] = food
+            self.workers[row] = workers
+            self.warriors[row] = warriors
+            self.queen_count[row] = len(queens)
+            self.queen_id[row] = queens[0][0] if queens else 0
+            self.objective[row] = OBJECTIVES.index(queens[0][1]) if queens else OBJ_BALANCED
+            self.action[row] = ACTION_NONE
+            self.gathering_modifier[row] = modifier
+            self.attack_multiplier[row] = attack
+            self.defense_multiplier[row] = defense
+            self.is_destroyed[row] = False
+            if "events" in state:
+                self.diaries.append(Diary.from_state(self.events, *state["diaries"][row]))
+            else:
+                self.diaries.append(restore_diary(self.events, hive_id, faction, diaries))
+            self.map.hive_index.insert(hive_id, x, y)
+            if queens: rows_by_queen[queens[0][0]] = row
+            self.count += 1
+        self.active_queens_queue = [QueenView(self, rows_by_queen[queen_id]) for queen_id in state["queue"]]